@@ -0,0 +1,415 @@
+# api_server.py
+"""Local HTTP API for other tools: submit images for OCR, follow jobs, page and search the history.
+
+Runs next to the GUI when API_SERVER is enabled, or headless with
+`python api_server.py --port 8765` (add `--fake` for the offline OCR
+stand-in). Listens on 127.0.0.1 by default, or on a Unix socket with
+--socket. If API_TOKEN is set, requests need `Authorization: Bearer <token>`.
+
+    POST /ocr          image file as the body; ?stream=1 streams NDJSON events
+    GET  /jobs/<id>    status and full text of a capture
+    GET  /history      ?before_id=&limit=, newest first
+    GET  /search       ?q=&limit=, best matches first
+    GET  /status       OCR queue counters
+"""
+import argparse
+import asyncio
+import functools
+import hmac
+import io
+import json
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+from db import ScopedSession
+
+MAX_BODY_BYTES = 32 * 1024 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+MAX_PAGE_SIZE = 200
+READ_TIMEOUT = 30.0  # Seconds a client may take to send its request
+POLL_INTERVAL = 0.05  # Seconds between manager polls when running headless
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def decode_image(data):
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            return image.copy()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise HTTPError(400, f"Body is not a supported image: {e}")
+
+
+def preview_json(row):
+    """JSON for a preview row (see ScreenshotManager.get_history_window)."""
+    return {
+        "id": row.id,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "stored_at": row.stored_at,
+        "status": row.status,
+        "last_error": row.last_error,
+        "preview": row.preview
+    }
+
+
+def screenshot_json(screenshot):
+    return {
+        "id": screenshot.id,
+        "created_at": screenshot.created_at.isoformat() if screenshot.created_at else None,
+        "stored_at": screenshot.stored_at,
+        "status": screenshot.status,
+        "attempts": screenshot.attempts,
+        "last_error": screenshot.last_error,
+        "text": screenshot.text
+    }
+
+
+class ApiServer:
+    """Serves the API from an asyncio loop.
+
+    Anything touching the OCR queue runs on the thread that polls the
+    ScreenshotManager (the Tk thread, or this loop with `poll_manager`)
+    and is handed over with `worker_pool.post`; that is only the row insert
+    and the enqueue. Decoding, storing and hashing images and database
+    reads run on a small thread pool, so no request blocks the loop or the
+    Tk thread.
+    """
+
+    def __init__(self, screenshot_manager, host="127.0.0.1", port=8765, unix_socket=None, token=None,
+                 poll_manager=False, db_workers=4):
+        self.screenshot_manager = screenshot_manager
+        self.host = host
+        self.port = port
+        self.unix_socket = unix_socket
+        self.token = token
+        self.poll_manager = poll_manager  # Headless: nothing else calls poll_jobs
+        self.loop = None
+        self._server = None
+        self._thread = None
+        self._listening = threading.Event()
+        self._startup_error = None
+        self._executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="api-db")
+
+    @property
+    def address(self):
+        return self.unix_socket or f"http://{self.host}:{self.port}"
+
+    async def serve(self, on_listening=None):
+        """Listen and handle requests until `stop` is called."""
+        self.loop = asyncio.get_running_loop()
+        if self.unix_socket:
+            self._server = await asyncio.start_unix_server(self.handle_connection, path=self.unix_socket,
+                                                           limit=MAX_HEADER_BYTES)
+        else:
+            self._server = await asyncio.start_server(self.handle_connection, self.host, self.port,
+                                                      limit=MAX_HEADER_BYTES)
+            self.port = self._server.sockets[0].getsockname()[1]  # The actual port when 0 was asked for
+        self._listening.set()
+        if on_listening is not None:
+            on_listening()
+        poller = asyncio.create_task(self._poll_manager()) if self.poll_manager else None
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            if poller is not None:
+                poller.cancel()
+            self._executor.shutdown(wait=False)
+
+    def start_in_thread(self, timeout=5.0):
+        """Serve from a daemon thread, e.g. next to the Tk loop. Raises OSError if the address is taken."""
+        self._thread = threading.Thread(target=self._run_thread, name="api-server", daemon=True)
+        self._thread.start()
+        self._listening.wait(timeout)
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    def _run_thread(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception as e:
+            self._startup_error = e
+            self._listening.set()
+
+    def stop(self):
+        """Stop listening; safe to call from any thread."""
+        if self.loop is not None and self._server is not None:
+            self.loop.call_soon_threadsafe(self._server.close)
+
+    async def _poll_manager(self):
+        while True:
+            self.screenshot_manager.poll_jobs()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def handle_connection(self, reader, writer):
+        """Serve one request per connection."""
+        try:
+            try:
+                method, path, query, headers, body = await self._read_request(reader)
+                self._check_token(headers)
+                await self.route(method, path, query, body, writer)
+            except HTTPError as e:
+                await self._send_json(writer, e.status, {"error": str(e)})
+            except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                raise
+            except Exception as e:
+                # A locked database or a bug; the client still gets an answer
+                traceback.print_exc()
+                await self._send_json(writer, 500, {"error": f"Internal error: {e}"})
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass  # Client went away or stalled
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), READ_TIMEOUT)
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise HTTPError(411, "Send the body with a Content-Length")
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b""
+        url = urlsplit(target)
+        return method, url.path, parse_qs(url.query), headers, body
+
+    def _check_token(self, headers):
+        if self.token and not hmac.compare_digest(headers.get("authorization", ""), f"Bearer {self.token}"):
+            raise HTTPError(401, "Missing or wrong API token")
+
+    async def route(self, method, path, query, body, writer):
+        parts = path.strip("/").split("/")
+        if path == "/ocr":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            await self.submit(query, body, writer)
+            return
+        if method != "GET":
+            raise HTTPError(405, "Use GET")
+        if path == "/history":
+            payload = await self.history(query)
+        elif path == "/search":
+            payload = await self.search(query)
+        elif path == "/status":
+            payload = await self.status()
+        elif len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+            payload = await self._in_thread(self._job, int(parts[1]))
+            if payload is None:
+                raise HTTPError(404, f"No capture with id {parts[1]}")
+        else:
+            raise HTTPError(404, "Not found")
+        await self._send_json(writer, 200, payload)
+
+    async def submit(self, query, body, writer):
+        """Store the image as a capture and queue it for OCR.
+
+        Replies 202 with the new id, or with ?stream=1 keeps the response open
+        and sends one JSON object per line: "queued", a "chunk" per piece of
+        OCR output, then "done" or "failed" with the stored row. A "failed"
+        row whose status is still "queued" will be retried.
+        """
+        if not body:
+            raise HTTPError(400, "Send the image file as the request body")
+        stream = query.get("stream", ["0"])[0].lower() in ("1", "true", "yes")
+        prepared = await self._in_thread(self._prepare_capture, body)
+        events = asyncio.Queue()
+
+        def put(*event):
+            self.loop.call_soon_threadsafe(events.put_nowait, event)
+
+        def capture():
+            # On the thread polling the manager
+            try:
+                row = self.screenshot_manager.queue_capture(
+                    prepared,
+                    on_chunk=(lambda chunk: put("chunk", chunk)) if stream else None,
+                    on_finished=(lambda ids, error: put("finished", error)) if stream else None
+                )
+            except Exception as e:
+                put("error", e)
+                return
+            put("queued", row.id)
+
+        self.screenshot_manager.worker_pool.post(capture)
+        kind, value = await events.get()
+        if kind == "error":
+            raise HTTPError(500, f"Capture failed: {value}")
+        screenshot_id = value
+        if not stream:
+            await self._send_json(writer, 202, {"id": screenshot_id, "status": "queued"})
+            return
+
+        await self._start_stream(writer)
+        await self._send_line(writer, {"event": "queued", "id": screenshot_id})
+        while True:
+            kind, value = await events.get()
+            if kind == "chunk":
+                await self._send_line(writer, {"event": "chunk", "id": screenshot_id, "text": value})
+                continue
+            event = {"event": "done" if value is None else "failed"}
+            try:
+                event.update(await self._in_thread(self._job, screenshot_id) or {"id": screenshot_id})
+            except Exception as e:
+                # Headers are already sent, so report it in the stream instead of as a 500
+                traceback.print_exc()
+                event.update({"id": screenshot_id, "lookup_error": str(e)})
+            if value is not None:
+                event["error"] = str(value)
+            await self._send_line(writer, event)
+            break
+        await self._end_stream(writer)
+
+    def _prepare_capture(self, body):
+        return self.screenshot_manager.prepare_capture(None, image=decode_image(body))
+
+    async def history(self, query):
+        limit = self._int_param(query, "limit", 50, maximum=MAX_PAGE_SIZE)
+        before_id = self._int_param(query, "before_id", None)
+        rows, total = await self._in_thread(self._history, before_id, limit)
+        items = [preview_json(row) for row in rows]
+        return {
+            "items": items,
+            "total": total,
+            "next_before_id": items[-1]["id"] if len(items) == limit else None
+        }
+
+    def _history(self, before_id, limit):
+        manager = self.screenshot_manager
+        return manager.get_history_window(before_id=before_id, limit=limit), manager.get_total_screenshots()
+
+    async def search(self, query):
+        text = query.get("q", [""])[0].strip()
+        if not text:
+            raise HTTPError(400, "Missing q")
+        limit = self._int_param(query, "limit", 50, maximum=MAX_PAGE_SIZE)
+        rows = await self._in_thread(self.screenshot_manager.search_screenshots, text, limit)
+        return {"items": [preview_json(row) for row in rows]}
+
+    async def status(self):
+        return {"jobs": self.screenshot_manager.jobs.stats(), "ocr": self.screenshot_manager.ocr_model.stats()}
+
+    def _job(self, screenshot_id):
+        screenshot = self.screenshot_manager.get_screenshot(screenshot_id)
+        return screenshot_json(screenshot) if screenshot is not None else None
+
+    async def _in_thread(self, fn, *args):
+        return await self.loop.run_in_executor(self._executor, functools.partial(self._call_db, fn, *args))
+
+    @staticmethod
+    def _call_db(fn, *args):
+        try:
+            return fn(*args)
+        finally:
+            ScopedSession.remove()  # A fresh session per request, so no stale rows pile up
+
+    @staticmethod
+    def _int_param(query, name, default, maximum=None):
+        if name not in query:
+            return default
+        try:
+            value = int(query[name][0])
+        except ValueError:
+            raise HTTPError(400, f"{name} must be an integer")
+        if value < 1:
+            raise HTTPError(400, f"{name} must be positive")
+        return min(value, maximum) if maximum is not None else value
+
+    @staticmethod
+    def _head(status, headers):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines += ["Connection: close", "", ""]
+        return "\r\n".join(lines).encode("latin-1")
+
+    async def _send_json(self, writer, status, payload):
+        body = json.dumps(payload).encode()
+        writer.write(self._head(status, {"Content-Type": "application/json", "Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    async def _start_stream(self, writer):
+        writer.write(self._head(200, {"Content-Type": "application/x-ndjson", "Transfer-Encoding": "chunked"}))
+        await writer.drain()
+
+    async def _send_line(self, writer, payload):
+        data = (json.dumps(payload) + "\n").encode()
+        writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+
+    async def _end_stream(self, writer):
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the OCR API without the GUI.")
+    parser.add_argument("--host", default=None, help="Address to listen on (default: API_HOST)")
+    parser.add_argument("--port", type=int, default=None, help="Port to listen on (default: API_PORT)")
+    parser.add_argument("--socket", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--fake", action="store_true", help="Use the offline OCR stand-in")
+    args = parser.parse_args(argv)
+
+    from config import Config
+    from db import init_db
+    from ocr import OCR
+    from blob_store import BlobStore
+    from screenshot_manager import ScreenshotManager
+
+    config = Config()
+    if args.fake:
+        config.ocr_backend = "fake"
+    init_db()
+    screenshot_manager = ScreenshotManager(
+        OCR.from_config(config),
+        max_workers=config.ocr_max_workers,
+        blob_store=BlobStore.from_config(config),
+        max_attempts=config.ocr_job_max_attempts,
+        retry_delay=config.ocr_job_retry_delay,
+        reuse_distance=config.ocr_reuse_distance
+    )
+    server = ApiServer(
+        screenshot_manager,
+        host=args.host or config.api_host,
+        port=args.port if args.port is not None else config.api_port,
+        unix_socket=args.socket or config.api_socket or None,
+        token=config.api_token or None,
+        poll_manager=True
+    )
+    print(f"Resuming {screenshot_manager.resume_jobs()} queued screenshot(s)")
+    try:
+        asyncio.run(server.serve(on_listening=lambda: print(f"Listening on {server.address}", flush=True)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        screenshot_manager.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+# batch_ocr.py
+"""Headless OCR of existing images, e.g. `python batch_ocr.py slides/ --workers 4 --rate 2`."""
+import argparse
+import glob
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from config import Config
+from db import Session, ScreenShot, WriteBehindQueue, init_db
+from ocr import OCR
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"}
+
+
+def iter_image_paths(source):
+    """Yield absolute image paths from a directory (recursively) or a glob pattern."""
+    if os.path.isdir(source):
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                    yield os.path.abspath(os.path.join(dirpath, name))
+    else:
+        for path in glob.iglob(source, recursive=True):
+            if os.path.isfile(path) and os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+                yield os.path.abspath(path)
+
+
+def load_processed_paths(session):
+    """Paths already stored in the DB, so an interrupted run can resume."""
+    return {stored_at for (stored_at,) in session.query(ScreenShot.stored_at)}
+
+
+class BatchRunner:
+    """Streams images through a bounded, rate-limited OCR pool and saves results in batches."""
+
+    def __init__(self, ocr_model, workers=4, batch_size=50):
+        self.ocr_model = ocr_model  # Rate limiting and retries are handled by the OCR client
+        self.workers = workers
+        self.batch_size = batch_size
+        # Rows are committed by a background writer, batch_size rows per commit
+        self.write_queue = WriteBehindQueue(max_batch=batch_size, max_delay=0.5)
+        # Cap queued work so huge directories are streamed rather than loaded up front
+        self._in_flight = threading.BoundedSemaphore(workers * 2)
+        self._counts_lock = threading.Lock()
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def _ocr(self, path):
+        try:
+            text = self.ocr_model.extract_text(path)
+            saved = self.write_queue.add(ScreenShot(stored_at=path, text=text, created_at=datetime.now()))
+            saved.add_done_callback(self._on_saved)
+        except Exception as e:
+            with self._counts_lock:
+                self.failed += 1
+            print(f"\nFailed: {path}: {e}", file=sys.stderr)
+        finally:
+            self._in_flight.release()
+
+    def _on_saved(self, future):
+        with self._counts_lock:
+            if future.exception() is None:
+                self.done += 1
+            else:
+                self.failed += 1
+
+    def run(self, paths, processed):
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-ocr")
+        try:
+            for path in paths:
+                if path in processed:
+                    self.skipped += 1
+                    continue
+                self._in_flight.acquire()
+                executor.submit(self._ocr, path)
+                self._print_progress(started)
+        except KeyboardInterrupt:
+            print("\nInterrupted, saving finished results...", file=sys.stderr)
+            executor.shutdown(wait=True, cancel_futures=True)
+        finally:
+            executor.shutdown(wait=True)
+            self.write_queue.close()
+        self._print_progress(started, final=True)
+
+    def _print_progress(self, started, final=False):
+        elapsed = time.monotonic() - started
+        throughput = self.done / elapsed if elapsed > 0 else 0.0
+        line = (f"saved {self.done}, failed {self.failed}, skipped {self.skipped} "
+                f"in {elapsed:.1f}s ({throughput:.2f} images/s)")
+        print(("\n" + line) if final else ("\r" + line), end="\n" if final else "", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR a directory or glob of images without the GUI.")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern, e.g. 'slides/**/*.png'")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent OCR requests (default: 4)")
+    parser.add_argument("--rate", type=float, default=2.0, help="Max OCR requests per second, 0 for unlimited (default: 2)")
+    parser.add_argument("--batch-size", type=int, default=50, help="Rows per database commit (default: 50)")
+    args = parser.parse_args(argv)
+
+    init_db()
+    config = Config()
+    config.ocr_rate_limit = args.rate
+    ocr_model = OCR.from_config(config)
+    runner = BatchRunner(ocr_model, workers=args.workers, batch_size=args.batch_size)
+    session = Session()
+    try:
+        processed = load_processed_paths(session)
+    finally:
+        session.close()
+    runner.run(iter_image_paths(args.source), processed)
+    return 1 if runner.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
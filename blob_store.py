@@ -0,0 +1,125 @@
+# blob_store.py
+"""Content-addressed storage for captured screenshots.
+
+Run `python blob_store.py gc` to delete blobs no longer referenced by the
+screenshots table.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+FORMATS = {
+    "png": ".png",
+    "webp": ".webp",
+}
+
+
+class BlobStore:
+    """Stores images under `root/ab/cd/<sha256>.<ext>`, keyed by their pixels.
+
+    Identical captures map to the same file and are only written once. The
+    returned path is what goes into `ScreenShot.stored_at`.
+    """
+
+    def __init__(self, root="screenshots", image_format="png", optimize=False):
+        if image_format not in FORMATS:
+            raise ValueError(f"Unsupported blob format: {image_format!r}")
+        self.root = root
+        self.image_format = image_format
+        self.optimize = optimize  # Slower, smaller PNGs (WebP is always lossless)
+
+    @staticmethod
+    def content_hash(image):
+        digest = hashlib.sha256()
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+        digest.update(image.tobytes())
+        return digest.hexdigest()
+
+    def path_for(self, content_hash):
+        return os.path.join(self.root, content_hash[:2], content_hash[2:4],
+                            content_hash + FORMATS[self.image_format])
+
+    def put(self, image):
+        """Store image (if not already present) and return its path."""
+        path = self.path_for(self.content_hash(image))
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so a crash never leaves a truncated blob
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if self.image_format == "webp":
+            image.save(tmp_path, format="WEBP", lossless=True, quality=100, method=4)
+        else:
+            image.save(tmp_path, format="PNG", optimize=self.optimize)
+        os.replace(tmp_path, path)
+        return path
+
+    def iter_blobs(self):
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                yield os.path.join(dirpath, name)
+
+    def gc(self, referenced_paths, min_age_seconds=3600, dry_run=False):
+        """Delete blobs that are not in referenced_paths.
+
+        Files younger than min_age_seconds are kept, so captures whose row
+        hasn't been committed yet are not collected. Returns (files, bytes).
+        """
+        referenced = {os.path.abspath(path) for path in referenced_paths if path}
+        cutoff = time.time() - min_age_seconds
+        removed_files = removed_bytes = 0
+        for path in self.iter_blobs():
+            if os.path.abspath(path) in referenced:
+                continue
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+            removed_files += 1
+            removed_bytes += stat.st_size
+        if not dry_run:
+            self._remove_empty_dirs()
+        return removed_files, removed_bytes
+
+    def _remove_empty_dirs(self):
+        for dirpath, dirnames, filenames in os.walk(self.root, topdown=False):
+            if dirpath != self.root and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(root=config.blob_dir, image_format=config.blob_format, optimize=config.blob_optimize)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the screenshot blob store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    gc_parser = subparsers.add_parser("gc", help="Delete blobs not referenced by the screenshots table")
+    gc_parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted")
+    gc_parser.add_argument("--min-age", type=int, default=3600,
+                           help="Keep unreferenced blobs younger than this many seconds (default: 3600)")
+    args = parser.parse_args(argv)
+
+    from config import Config
+    from db import Session, ScreenShot, init_db
+
+    init_db()
+    store = BlobStore.from_config(Config())
+    session = Session()
+    try:
+        referenced = [stored_at for (stored_at,) in session.query(ScreenShot.stored_at).yield_per(1000)]
+    finally:
+        session.close()
+    files, size = store.gc(referenced, min_age_seconds=args.min_age, dry_run=args.dry_run)
+    action = "Would remove" if args.dry_run else "Removed"
+    print(f"{action} {files} blob(s), {size / 1024 / 1024:.1f} MiB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
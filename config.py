@@ -1,12 +1,76 @@
 import os
-from dotenv import load_dotenv
+from dotenv import load_dotenv, set_key
+
+def _env_flag(name, default):
+    return os.getenv(name, default).strip().lower() in ('1', 'true', 'yes', 'on')
 
 class Config:
     def __init__(self):
         load_dotenv()
         self.gemini_api_key = os.getenv('GEMINI_API_KEY', '')
+        # Number of OCR requests allowed to run in the background at once
+        self.ocr_max_workers = int(os.getenv('OCR_MAX_WORKERS', '2'))
+        # Queued OCR jobs: attempts per capture and seconds between them after a temporary failure
+        self.ocr_job_max_attempts = int(os.getenv('OCR_JOB_MAX_ATTEMPTS', '3'))
+        self.ocr_job_retry_delay = float(os.getenv('OCR_JOB_RETRY_DELAY', '30'))
+        # Grab the whole screen when the hotkey fires and select on that still frame
+        self.freeze_frame = _env_flag('FREEZE_FRAME', 'true')
+        # Watch-region mode: poll interval and fraction of the region that must change
+        self.watch_interval = float(os.getenv('WATCH_INTERVAL', '0.5'))
+        self.watch_change_threshold = float(os.getenv('WATCH_CHANGE_THRESHOLD', '0.02'))
+        # Near-duplicate captures (see image_hash.py): max dHash distance shown by "Find Similar",
+        # and the distance within which a capture reuses an earlier one's text (-1 disables)
+        self.similar_max_distance = int(os.getenv('SIMILAR_MAX_DISTANCE', '8'))
+        self.ocr_reuse_distance = int(os.getenv('OCR_REUSE_DISTANCE', '-1'))
+        # Stream OCR output into a viewer as it is generated
+        self.stream_ocr = _env_flag('OCR_STREAM', 'true')
+        # OCR result cache limits (in-memory LRU and the persistent ocr_cache table)
+        self.ocr_cache_memory_entries = int(os.getenv('OCR_CACHE_MEMORY_ENTRIES', '256'))
+        self.ocr_cache_max_entries = int(os.getenv('OCR_CACHE_MAX_ENTRIES', '10000'))
+        self.ocr_cache_max_age_days = int(os.getenv('OCR_CACHE_MAX_AGE_DAYS', '90'))
+        # Which OCR engine to use: gemini, fake (offline stand-in) or tesseract
+        self.ocr_backend = os.getenv('OCR_BACKEND', 'gemini').strip().lower()
+        self.fake_ocr_latency = float(os.getenv('FAKE_OCR_LATENCY', '0.5'))
+        self.fake_ocr_jitter = float(os.getenv('FAKE_OCR_JITTER', '0.0'))
+        self.fake_ocr_failure_rate = float(os.getenv('FAKE_OCR_FAILURE_RATE', '0.0'))
+        self.fake_ocr_seed = int(os.getenv('FAKE_OCR_SEED', '0'))
+        self.tesseract_lang = os.getenv('TESSERACT_LANG', 'eng')
+        # Client-side protection for OCR API calls (see resilience.py)
+        self.ocr_rate_limit = float(os.getenv('OCR_RATE_LIMIT', '1.0'))  # Requests per second, 0 disables
+        self.ocr_burst = float(os.getenv('OCR_BURST', '2'))
+        self.ocr_max_attempts = int(os.getenv('OCR_MAX_ATTEMPTS', '4'))
+        self.ocr_timeout = float(os.getenv('OCR_TIMEOUT', '60'))
+        self.ocr_circuit_failures = int(os.getenv('OCR_CIRCUIT_FAILURES', '5'))
+        self.ocr_circuit_reset_seconds = float(os.getenv('OCR_CIRCUIT_RESET_SECONDS', '30'))
+        # Content-addressed screenshot storage (see blob_store.py)
+        self.blob_dir = os.getenv('BLOB_DIR', 'screenshots')
+        self.blob_format = os.getenv('BLOB_FORMAT', 'png').strip().lower()
+        self.blob_optimize = _env_flag('BLOB_OPTIMIZE', 'false')
+        # Where viewer thumbnails are cached on disk
+        self.thumbnail_dir = os.getenv('THUMBNAIL_DIR', 'thumbnails')
+        # Rendered formulas in the viewer (needs matplotlib) and where the renders are cached
+        self.render_math = _env_flag('MATH_RENDER', 'true')
+        self.math_render_dir = os.getenv('MATH_RENDER_DIR', 'math_renders')
+        # Local HTTP API for other tools (see api_server.py); API_SOCKET listens on a Unix socket instead
+        self.api_server = _env_flag('API_SERVER', 'false')
+        self.api_host = os.getenv('API_HOST', '127.0.0.1')
+        self.api_port = int(os.getenv('API_PORT', '8765'))
+        self.api_socket = os.getenv('API_SOCKET', '')
+        self.api_token = os.getenv('API_TOKEN', '')
+        # Tall captures are split into bands OCRed in parallel (see tiling.py)
+        self.tile_min_height = int(os.getenv('OCR_TILE_MIN_HEIGHT', '1600'))  # 0 disables tiling
+        self.tile_band_height = int(os.getenv('OCR_TILE_BAND_HEIGHT', '1000'))
+        self.tile_overlap = int(os.getenv('OCR_TILE_OVERLAP', '40'))
+        self.tile_workers = int(os.getenv('OCR_TILE_WORKERS', '4'))
+        # Image preprocessing applied before the capture is sent for OCR
+        self.preprocess_grayscale = _env_flag('OCR_PREPROCESS_GRAYSCALE', 'true')
+        self.preprocess_trim_margins = _env_flag('OCR_PREPROCESS_TRIM', 'true')
+        self.preprocess_source_dpi = int(os.getenv('OCR_SOURCE_DPI', '96'))
+        self.preprocess_max_dpi = int(os.getenv('OCR_MAX_DPI', '150'))
+        self.preprocess_palette_colors = int(os.getenv('OCR_PALETTE_COLORS', '16'))
 
     def save_gemini_api_key(self, key):
-        with open(".env", "w") as f:
-            f.write(f"GEMINI_API_KEY={key}")
-        os.environ['GEMINI_API_KEY'] = key
\ No newline at end of file
+        # Update only our key so other settings in .env survive
+        set_key(".env", "GEMINI_API_KEY", key, quote_mode="never")
+        os.environ['GEMINI_API_KEY'] = key
+        self.gemini_api_key = key
\ No newline at end of file
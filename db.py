@@ -1,6 +1,11 @@
 import datetime
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from sqlalchemy import create_engine, event, Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.orm import sessionmaker, scoped_session, declarative_base
 
 # Create a base class for our class definitions
 Base = declarative_base()
@@ -8,19 +13,258 @@ Base = declarative_base()
 # Define a model (table)
 class ScreenShot(Base):
     __tablename__ = 'screenshots'
+    # OCR job states (see ocr_jobs.py)
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
     id = Column(Integer, primary_key=True)
-    created_at = Column(DateTime, default=datetime.datetime.now(datetime.timezone.utc))
+    created_at = Column(DateTime, default=datetime.datetime.now, index=True)
     stored_at = Column(String)
     text = Column(String) # The text extracted from the screenshot
+    status = Column(String, nullable=False, default=DONE, index=True)
+    attempts = Column(Integer, nullable=False, default=0)  # OCR attempts for the current job
+    last_error = Column(String)
+    updated_at = Column(DateTime)
+    dhash = Column(BigInteger, index=True)  # Perceptual hash, signed 64-bit (see image_hash.py)
     def __repr__(self):
         # return f"<User(name={self.name}, email={self.email})>"
         return f"<ScreenShot(created_at={self.created_at}, stored_at={self.stored_at}, text={self.text})>"
 
+# OCR results keyed by a hash of the image pixels, prompt and model (see ocr_cache.py)
+class OCRCacheEntry(Base):
+    __tablename__ = 'ocr_cache'
+    key = Column(String(64), primary_key=True)
+    text = Column(String)
+    created_at = Column(DateTime, default=datetime.datetime.now)
+    last_used_at = Column(DateTime, default=datetime.datetime.now, index=True)
+    def __repr__(self):
+        return f"<OCRCacheEntry(key={self.key}, last_used_at={self.last_used_at})>"
+
+# Row counts kept current by triggers, so paging never needs a full COUNT(*)
+class TableStats(Base):
+    __tablename__ = 'table_stats'
+    table_name = Column(String, primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
+
+def fts_text(text):
+    """Text as the full-text index holds it: a space before every backslash.
+
+    Keeps a LaTeX command stuck to what precedes it, as in 2\\pi or
+    \\alpha\\beta, a token of its own. Mirrors FTS_TEXT_SQL.
+    """
+    return text.replace("\\", " \\")
+
+# fts_text in SQL, for the triggers that maintain the index
+FTS_TEXT_SQL = "replace({}, '\\', ' \\')"
+
+def add_column(table, column, definition):
+    """Migration step that adds a column unless it already exists."""
+    def migrate(connection):
+        columns = [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return migrate
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Never edit a released step; append a new one instead. Statements should be
+# idempotent because SQLite DDL is not wrapped in the migration transaction.
+# A statement is either SQL or a callable taking the connection.
+MIGRATIONS = [
+    # 1: base schema, row counter and full-text index
+    [
+        """CREATE TABLE IF NOT EXISTS screenshots (
+               id INTEGER NOT NULL PRIMARY KEY,
+               created_at DATETIME,
+               stored_at VARCHAR,
+               text VARCHAR
+           )""",
+        "CREATE INDEX IF NOT EXISTS ix_screenshots_created_at ON screenshots (created_at)",
+        """CREATE TABLE IF NOT EXISTS ocr_cache (
+               key VARCHAR(64) NOT NULL PRIMARY KEY,
+               text VARCHAR,
+               created_at DATETIME,
+               last_used_at DATETIME
+           )""",
+        "CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used_at ON ocr_cache (last_used_at)",
+        """CREATE TABLE IF NOT EXISTS table_stats (
+               table_name VARCHAR NOT NULL PRIMARY KEY,
+               row_count INTEGER NOT NULL
+           )""",
+        "INSERT OR IGNORE INTO table_stats (table_name, row_count) SELECT 'screenshots', COUNT(*) FROM screenshots",
+        """CREATE TRIGGER IF NOT EXISTS screenshots_count_insert AFTER INSERT ON screenshots
+           BEGIN UPDATE table_stats SET row_count = row_count + 1 WHERE table_name = 'screenshots'; END""",
+        """CREATE TRIGGER IF NOT EXISTS screenshots_count_delete AFTER DELETE ON screenshots
+           BEGIN UPDATE table_stats SET row_count = row_count - 1 WHERE table_name = 'screenshots'; END""",
+        # Full-text index over screenshots.text. Backslash counts as a token character
+        # so LaTeX commands like \frac or \int are indexed as whole words.
+        r"""CREATE VIRTUAL TABLE IF NOT EXISTS screenshots_fts USING fts5(
+               text, content='screenshots', content_rowid='id', tokenize="unicode61 tokenchars '\'"
+           )""",
+        "INSERT INTO screenshots_fts (screenshots_fts) VALUES ('rebuild')",
+        # Keep the full-text index in sync with screenshots.text
+        """CREATE TRIGGER IF NOT EXISTS screenshots_fts_insert AFTER INSERT ON screenshots
+           BEGIN INSERT INTO screenshots_fts (rowid, text) VALUES (new.id, new.text); END""",
+        """CREATE TRIGGER IF NOT EXISTS screenshots_fts_delete AFTER DELETE ON screenshots
+           BEGIN INSERT INTO screenshots_fts (screenshots_fts, rowid, text) VALUES ('delete', old.id, old.text); END""",
+        """CREATE TRIGGER IF NOT EXISTS screenshots_fts_update AFTER UPDATE OF text ON screenshots
+           BEGIN
+               INSERT INTO screenshots_fts (screenshots_fts, rowid, text) VALUES ('delete', old.id, old.text);
+               INSERT INTO screenshots_fts (rowid, text) VALUES (new.id, new.text);
+           END""",
+    ],
+    # 2: durable OCR job state; existing rows are already OCRed
+    [
+        add_column("screenshots", "status", "VARCHAR NOT NULL DEFAULT 'done'"),
+        add_column("screenshots", "attempts", "INTEGER NOT NULL DEFAULT 0"),
+        add_column("screenshots", "last_error", "VARCHAR"),
+        add_column("screenshots", "updated_at", "DATETIME"),
+        "CREATE INDEX IF NOT EXISTS ix_screenshots_status ON screenshots (status)",
+    ],
+    # 3: perceptual hashes for near-duplicate lookup; old rows are filled by `image_hash.py backfill`
+    [
+        add_column("screenshots", "dhash", "BIGINT"),
+        "CREATE INDEX IF NOT EXISTS ix_screenshots_dhash ON screenshots (dhash)",
+    ],
+    # 4: index fts_text(text) so LaTeX commands split from the previous character.
+    # The index holds its own terms only (contentless), since they differ from screenshots.text.
+    [
+        "DROP TRIGGER IF EXISTS screenshots_fts_insert",
+        "DROP TRIGGER IF EXISTS screenshots_fts_delete",
+        "DROP TRIGGER IF EXISTS screenshots_fts_update",
+        "DROP TABLE IF EXISTS screenshots_fts",
+        r"""CREATE VIRTUAL TABLE screenshots_fts USING fts5(
+               text, content='', tokenize="unicode61 tokenchars ''"
+           )""",
+        f"""INSERT INTO screenshots_fts (rowid, text)
+            SELECT id, {FTS_TEXT_SQL.format('text')} FROM screenshots WHERE text IS NOT NULL""",
+        f"""CREATE TRIGGER screenshots_fts_insert AFTER INSERT ON screenshots WHEN new.text IS NOT NULL
+            BEGIN INSERT INTO screenshots_fts (rowid, text) VALUES (new.id, {FTS_TEXT_SQL.format('new.text')}); END""",
+        f"""CREATE TRIGGER screenshots_fts_delete AFTER DELETE ON screenshots WHEN old.text IS NOT NULL
+            BEGIN
+                INSERT INTO screenshots_fts (screenshots_fts, rowid, text)
+                VALUES ('delete', old.id, {FTS_TEXT_SQL.format('old.text')});
+            END""",
+        f"""CREATE TRIGGER screenshots_fts_update AFTER UPDATE OF text ON screenshots
+            BEGIN
+                INSERT INTO screenshots_fts (screenshots_fts, rowid, text)
+                SELECT 'delete', old.id, {FTS_TEXT_SQL.format('old.text')} WHERE old.text IS NOT NULL;
+                INSERT INTO screenshots_fts (rowid, text)
+                SELECT new.id, {FTS_TEXT_SQL.format('new.text')} WHERE new.text IS NOT NULL;
+            END""",
+    ],
+]
+
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",  # Readers don't block the writer and vice versa
+    "PRAGMA synchronous = NORMAL",  # Safe with WAL, avoids an fsync per commit
+    "PRAGMA busy_timeout = 5000",  # Wait for competing writers instead of failing
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -20000",  # ~20 MB page cache per connection
+    "PRAGMA temp_store = MEMORY",
+]
+
 # Create an engine that stores data in the local directory's sqlite file.
-engine = create_engine('sqlite:///math_ocr.db', echo=True)
+engine = create_engine(
+    os.getenv('MATH_OCR_DB_URL', 'sqlite:///math_ocr.db'),
+    echo=os.getenv('SQL_ECHO', '').lower() in ('1', 'true', 'yes')
+)
 
-# Create all tables in the engine (if they don't exist yet)
-Base.metadata.create_all(engine)
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
 
 # Create a configured "Session" class
-Session = sessionmaker(bind=engine)
\ No newline at end of file
+Session = sessionmaker(bind=engine)
+# Thread-local sessions for code that may run on several threads
+ScopedSession = scoped_session(Session)
+
+
+def init_db():
+    """Bring the database schema up to date. Safe to call on every start."""
+    with engine.begin() as connection:
+        version = connection.exec_driver_sql("PRAGMA user_version").scalar()
+        for target, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.exec_driver_sql(statement)
+            connection.exec_driver_sql(f"PRAGMA user_version = {target}")
+
+
+class WriteBehindQueue:
+    """Collects new rows from any thread and inserts them in batched commits.
+
+    `add` returns a Future that resolves to the committed (detached) object
+    once its batch is written, so callers can wait for the id if they need it.
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_batch=100, max_delay=0.05):
+        self.max_batch = max_batch
+        self.max_delay = max_delay  # Seconds to wait for more rows before committing
+        self._queue = queue.Queue()
+        # Objects stay readable after commit since they outlive the writer's session
+        self._session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, obj):
+        """Queue obj for insertion and return a Future for the committed object."""
+        future = Future()
+        self._queue.put(([obj], future, True))
+        return future
+
+    def add_all(self, objs):
+        """Queue objs to be inserted in the same transaction; the Future resolves to the list."""
+        future = Future()
+        self._queue.put((list(objs), future, False))
+        return future
+
+    def close(self, timeout=None):
+        """Write out everything queued so far and stop the writer thread."""
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        session = self._session_factory()
+        try:
+            for objs, future, single in batch:
+                session.add_all(objs)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            for objs, future, single in batch:
+                future.set_exception(e)
+            return
+        finally:
+            session.close()
+        for objs, future, single in batch:
+            future.set_result(objs[0] if single else objs)
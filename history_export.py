@@ -0,0 +1,262 @@
+# history_export.py
+"""Export the capture history to JSONL, Markdown or a LaTeX document.
+
+    python history_export.py history.tex --since 2026-01-01 --query "\\frac"
+
+Rows are read in keyset-paged chunks of plain columns and written as they
+arrive, so memory use doesn't grow with the size of the history.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import text as sql_text
+from db import Session, ScreenShot, init_db
+from math_render import split_math
+from screenshot_manager import build_fts_query
+
+CHUNK_SIZE = 500  # Rows fetched per query
+
+# Characters with a special meaning in LaTeX text mode
+LATEX_ESCAPES = str.maketrans({
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+    "$": r"\$",
+})
+
+# Unicode math symbols OCR output often contains, as LaTeX commands. Mapped
+# so they compile under pdflatex too, where inputenc only knows accented
+# letters; anything else needs xelatex or lualatex.
+UNICODE_MATH = {
+    "α": r"\alpha", "β": r"\beta", "γ": r"\gamma", "δ": r"\delta", "ε": r"\epsilon",
+    "ζ": r"\zeta", "η": r"\eta", "θ": r"\theta", "ι": r"\iota", "κ": r"\kappa",
+    "λ": r"\lambda", "μ": r"\mu", "ν": r"\nu", "ξ": r"\xi", "π": r"\pi",
+    "ρ": r"\rho", "σ": r"\sigma", "τ": r"\tau", "υ": r"\upsilon", "φ": r"\phi",
+    "χ": r"\chi", "ψ": r"\psi", "ω": r"\omega", "Γ": r"\Gamma", "Δ": r"\Delta",
+    "Θ": r"\Theta", "Λ": r"\Lambda", "Ξ": r"\Xi", "Π": r"\Pi", "Σ": r"\Sigma",
+    "Φ": r"\Phi", "Ψ": r"\Psi", "Ω": r"\Omega",
+    "×": r"\times", "÷": r"\div", "±": r"\pm", "∓": r"\mp", "·": r"\cdot",
+    "−": "-", "≤": r"\leq", "≥": r"\geq", "≠": r"\neq", "≈": r"\approx",
+    "≡": r"\equiv", "∝": r"\propto", "∞": r"\infty", "∂": r"\partial", "∇": r"\nabla",
+    "∑": r"\sum", "∏": r"\prod", "∫": r"\int", "√": r"\surd", "∈": r"\in",
+    "∉": r"\notin", "⊂": r"\subset", "⊆": r"\subseteq", "∪": r"\cup", "∩": r"\cap",
+    "∅": r"\emptyset", "∀": r"\forall", "∃": r"\exists", "¬": r"\neg", "∧": r"\wedge",
+    "∨": r"\vee", "→": r"\to", "←": r"\leftarrow", "↔": r"\leftrightarrow",
+    "⇒": r"\Rightarrow", "⇐": r"\Leftarrow", "⇔": r"\Leftrightarrow", "°": r"^\circ",
+    "…": r"\ldots",
+}
+LATEX_MATH_SYMBOLS = str.maketrans({char: f"{command} " for char, command in UNICODE_MATH.items()})
+LATEX_TEXT_SYMBOLS = str.maketrans({char: f"\\ensuremath{{{command}}}" for char, command in UNICODE_MATH.items()})
+
+
+def iter_rows(since=None, until=None, query=None, chunk_size=CHUNK_SIZE):
+    """Yield screenshot rows oldest first, optionally filtered.
+
+    `since`/`until` bound `created_at` (until is exclusive) and `query` is
+    matched with the full-text index. Each chunk is a separate keyset query
+    in a short-lived session, and only plain columns are loaded, so nothing
+    accumulates in an identity map.
+    """
+    match = build_fts_query(query) if query else None
+    if query and match is None:
+        return
+    last_id = 0
+    while True:
+        session = Session()
+        try:
+            rows = session.query(
+                ScreenShot.id,
+                ScreenShot.created_at,
+                ScreenShot.stored_at,
+                ScreenShot.status,
+                ScreenShot.text
+            ).filter(ScreenShot.id > last_id)
+            if since is not None:
+                rows = rows.filter(ScreenShot.created_at >= since)
+            if until is not None:
+                rows = rows.filter(ScreenShot.created_at < until)
+            if match is not None:
+                rows = rows.filter(ScreenShot.id.in_(
+                    sql_text("SELECT rowid FROM screenshots_fts WHERE screenshots_fts MATCH :match")
+                    .bindparams(match=match)))
+            rows = rows.order_by(ScreenShot.id).limit(chunk_size).all()
+        finally:
+            session.close()
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_id = rows[-1].id
+
+
+def latex_escape(text):
+    """Text-mode LaTeX for text; an escaped \\$ stays a literal dollar."""
+    return text.replace("\\$", "$").translate(LATEX_ESCAPES).translate(LATEX_TEXT_SYMBOLS)
+
+
+def latex_math(latex):
+    """Math-mode LaTeX for latex, without blank lines (a paragraph break ends math mode)."""
+    lines = [line for line in latex.translate(LATEX_MATH_SYMBOLS).splitlines() if line.strip()]
+    return "\n".join(lines)
+
+
+class JsonlWriter:
+    extension = ".jsonl"
+
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def write(self, row):
+        self.out.write(json.dumps({
+            "id": row.id,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "stored_at": row.stored_at,
+            "status": row.status,
+            "text": row.text
+        }, ensure_ascii=False) + "\n")
+
+    def end(self):
+        pass
+
+
+class MarkdownWriter(JsonlWriter):
+    extension = ".md"
+
+    def begin(self):
+        self.out.write("# Math OCR history\n\n")
+
+    def write(self, row):
+        created_at = row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else ""
+        self.out.write(f"## #{row.id} · {created_at}\n\n")
+        if row.stored_at:
+            self.out.write(f"![capture {row.id}]({row.stored_at})\n\n")
+        self.out.write((row.text or f"_No text ({row.status})_").strip() + "\n\n")
+
+
+class LatexWriter(JsonlWriter):
+    """A standalone article; text is escaped and $...$/$$...$$ spans are kept as math.
+
+    The preamble uses fontspec under xelatex/lualatex, which handle any script
+    the fonts cover, and utf8 inputenc with T1 fonts under pdflatex.
+    """
+
+    extension = ".tex"
+
+    def begin(self):
+        self.out.write(
+            "\\documentclass{article}\n"
+            "\\usepackage{iftex}\n"
+            "\\ifPDFTeX\n"
+            "\\usepackage[utf8]{inputenc}\n"
+            "\\usepackage[T1]{fontenc}\n"
+            "\\usepackage{lmodern}\n"
+            "\\else\n"
+            "\\usepackage{fontspec}\n"
+            "\\fi\n"
+            "\\usepackage{amsmath,amssymb}\n"
+            "\\begin{document}\n"
+            "\\section*{Math OCR history}\n\n"
+        )
+
+    def write(self, row):
+        created_at = row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else ""
+        self.out.write(f"\\subsection*{{\\#{row.id} --- {created_at}}}\n")
+        if not row.text:
+            self.out.write(f"\\emph{{No text ({latex_escape(row.status or '')})}}\n\n")
+            return
+        for kind, content in split_math(row.text):
+            if kind == "text":
+                self.out.write(latex_escape(content))
+            elif kind == "display":
+                self.out.write(f"\n\\[\n{latex_math(content)}\n\\]\n")
+            else:
+                self.out.write(f"${latex_math(content)}$")
+        self.out.write("\n\n")
+
+    def end(self):
+        self.out.write("\\end{document}\n")
+
+
+FORMATS = {
+    "jsonl": JsonlWriter,
+    "md": MarkdownWriter,
+    "tex": LatexWriter,
+}
+
+
+def format_for_path(path):
+    """Export format implied by the file extension, or None."""
+    extension = os.path.splitext(path)[1].lower()
+    for name, writer in FORMATS.items():
+        if writer.extension == extension:
+            return name
+    return None
+
+
+def export_history(path, export_format, since=None, until=None, query=None):
+    """Write the matching rows to path and return how many were written.
+
+    The file is written under a temporary name and moved into place at
+    the end, so a failed export never leaves a truncated file behind.
+    """
+    tmp_path = f"{path}.tmp"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            writer = FORMATS[export_format](out)
+            writer.begin()
+            for row in iter_rows(since=since, until=until, query=query):
+                writer.write(row)
+                count += 1
+            writer.end()
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def parse_date(value, end=False):
+    """ISO date or datetime; a bare date used as an end bound covers that whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the capture history.")
+    parser.add_argument("output", help="File to write; the format follows from .jsonl, .md or .tex")
+    parser.add_argument("--format", choices=sorted(FORMATS), default=None, help="Override the format")
+    parser.add_argument("--since", default=None, help="Only captures on or after this date (YYYY-MM-DD[THH:MM])")
+    parser.add_argument("--until", default=None, help="Only captures before this date (a bare date includes that day)")
+    parser.add_argument("--query", default=None, help="Only captures whose text matches this search")
+    args = parser.parse_args(argv)
+
+    export_format = args.format or format_for_path(args.output)
+    if export_format is None:
+        parser.error("can't tell the format from the file name, pass --format")
+    try:
+        since = parse_date(args.since) if args.since else None
+        until = parse_date(args.until, end=True) if args.until else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    init_db()
+    count = export_history(args.output, export_format, since=since, until=until, query=args.query)
+    print(f"Exported {count} capture(s) to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
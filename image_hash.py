@@ -0,0 +1,182 @@
+# image_hash.py
+"""Perceptual hashes for finding near-duplicate captures.
+
+Captures of the same slide or equation that differ by a few pixels of crop
+have different blob hashes but nearly identical dHashes, so they are found
+by Hamming distance instead of exact lookup.
+
+Run `python image_hash.py backfill` to hash rows stored before hashes were
+recorded, or `python image_hash.py bench --rows 100000` to time lookups.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8  # dHash grid; 8x8 gives the 64-bit hashes stored in ScreenShot.dhash
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(values):
+        return np.bitwise_count(values)
+else:
+    _BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        return _BYTE_BITS[values.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+
+def dhash(image):
+    """64-bit difference hash of image, as an unsigned int.
+
+    The image is box-filtered down to a 9x8 grayscale grid and each bit
+    says whether a cell is brighter than its right neighbour.
+    """
+    small = image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.BOX)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def to_db(value):
+    """Unsigned hash to the signed 64-bit integer SQLite stores."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def from_db(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+class HashIndex:
+    """In-memory Hamming-distance index over the screenshots' dHashes.
+
+    Hashes are kept in one packed uint64 array and compared all at once with
+    a vectorized XOR and popcount, which takes well under a millisecond
+    per 100k rows. New hashes are buffered and merged into the array on the
+    next query. Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._added = []  # (id, hash) pairs not yet merged into the arrays
+        self.loaded = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._ids) + len(self._added)
+
+    def load(self):
+        """Read every stored hash from the database (once)."""
+        from db import Session, ScreenShot
+        with self._lock:
+            if self.loaded:
+                return
+            session = Session()
+            try:
+                rows = (session.query(ScreenShot.id, ScreenShot.dhash)
+                        .filter(ScreenShot.dhash.isnot(None))
+                        .order_by(ScreenShot.id)
+                        .all())
+            finally:
+                session.close()
+            self._ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+            # Stored signed; the same 64 bits reinterpreted as unsigned
+            self._hashes = np.fromiter((row.dhash for row in rows), dtype=np.int64, count=len(rows)).view(np.uint64)
+            self._added = []  # Already committed, so included above
+            self.loaded = True
+
+    def add(self, screenshot_id, value):
+        with self._lock:
+            self._added.append((screenshot_id, value))
+
+    def nearest(self, value, max_distance, limit=20, exclude=None):
+        """[(screenshot_id, distance)] within max_distance of value, closest then newest first."""
+        self.load()
+        with self._lock:
+            if self._added:
+                ids, hashes = zip(*self._added)
+                self._ids = np.concatenate([self._ids, np.array(ids, dtype=np.int64)])
+                self._hashes = np.concatenate([self._hashes, np.array(hashes, dtype=np.uint64)])
+                self._added = []
+            ids, hashes = self._ids, self._hashes
+        distances = _popcount(hashes ^ np.uint64(value))
+        matches = np.flatnonzero(distances <= max_distance)
+        if exclude is not None:
+            matches = matches[ids[matches] != exclude]
+        # Sort by distance, then by id descending
+        order = np.lexsort((-ids[matches], distances[matches]))[:limit]
+        return [(int(ids[matches[i]]), int(distances[matches[i]])) for i in order]
+
+
+def backfill(batch_size=500):
+    """Hash stored rows that have no dHash yet; returns (hashed, missing files)."""
+    from db import Session, ScreenShot
+    hashed = missing = 0
+    last_id = 0
+    session = Session()
+    try:
+        while True:
+            rows = (session.query(ScreenShot.id, ScreenShot.stored_at)
+                    .filter(ScreenShot.dhash.is_(None), ScreenShot.id > last_id)
+                    .order_by(ScreenShot.id)
+                    .limit(batch_size)
+                    .all())
+            if not rows:
+                return hashed, missing
+            for row in rows:
+                if not row.stored_at or not os.path.exists(row.stored_at):
+                    missing += 1
+                    continue
+                with Image.open(row.stored_at) as image:
+                    value = dhash(image)
+                (session.query(ScreenShot)
+                 .filter(ScreenShot.id == row.id)
+                 .update({ScreenShot.dhash: to_db(value)}, synchronize_session=False))
+                hashed += 1
+            session.commit()
+            last_id = rows[-1].id
+    finally:
+        session.close()
+
+
+def benchmark(rows=100000, queries=200, max_distance=8, seed=0):
+    """Median milliseconds per nearest() query over `rows` random hashes."""
+    rng = np.random.default_rng(seed)
+    index = HashIndex()
+    index.loaded = True  # Synthetic, don't read the database
+    index._ids = np.arange(1, rows + 1, dtype=np.int64)
+    index._hashes = rng.integers(0, np.iinfo(np.uint64).max, size=rows, dtype=np.uint64, endpoint=True)
+    samples = []
+    for value in rng.choice(index._hashes, size=queries):
+        started = time.perf_counter()
+        index.nearest(int(value), max_distance)
+        samples.append(time.perf_counter() - started)
+    return sorted(samples)[len(samples) // 2] * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain and benchmark the perceptual hash index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Hash stored screenshots that have no hash yet")
+    bench_parser = subparsers.add_parser("bench", help="Time lookups on a synthetic index")
+    bench_parser.add_argument("--rows", type=int, default=100000, help="Indexed hashes (default: 100000)")
+    bench_parser.add_argument("--distance", type=int, default=8, help="Max Hamming distance (default: 8)")
+    args = parser.parse_args(argv)
+
+    if args.command == "bench":
+        print(f"{args.rows} rows: {benchmark(args.rows, max_distance=args.distance):.2f} ms per query (median)")
+        return 0
+
+    from db import init_db
+    init_db()
+    hashed, missing = backfill()
+    print(f"Hashed {hashed} screenshot(s), {missing} skipped with missing files")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
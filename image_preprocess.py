@@ -0,0 +1,68 @@
+import io
+from PIL import Image, ImageChops
+
+
+class PreprocessOptions:
+    """Settings for shrinking a capture before it is sent for OCR."""
+
+    def __init__(self, grayscale=True, trim_margins=True, trim_tolerance=16, margin=4,
+                 source_dpi=96, max_dpi=150, palette_colors=16):
+        self.grayscale = grayscale
+        self.trim_margins = trim_margins
+        self.trim_tolerance = trim_tolerance  # Max per-channel difference still treated as background
+        self.margin = margin  # Pixels of background kept around the trimmed content
+        self.source_dpi = source_dpi  # Pixel density of the captured screen
+        self.max_dpi = max_dpi
+        self.palette_colors = palette_colors  # 0 disables quantization
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            grayscale=config.preprocess_grayscale,
+            trim_margins=config.preprocess_trim_margins,
+            source_dpi=config.preprocess_source_dpi,
+            max_dpi=config.preprocess_max_dpi,
+            palette_colors=config.preprocess_palette_colors
+        )
+
+
+def trim_uniform_margins(image, tolerance=16, margin=4):
+    """Crop away borders that match the top-left pixel's colour."""
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    diff = ImageChops.difference(image, background)
+    if diff.mode != "L":
+        diff = diff.convert("L")
+    bbox = diff.point(lambda v: 255 if v > tolerance else 0).getbbox()
+    if bbox is None:
+        return image  # Blank capture, nothing to trim
+    left, top, right, bottom = bbox
+    return image.crop((
+        max(left - margin, 0),
+        max(top - margin, 0),
+        min(right + margin, image.width),
+        min(bottom + margin, image.height)
+    ))
+
+
+def preprocess(image, options):
+    """Apply grayscale, trimming, downscaling and quantization as configured."""
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    if options.grayscale:
+        image = image.convert("L")
+    if options.trim_margins:
+        image = trim_uniform_margins(image, options.trim_tolerance, options.margin)
+    if options.max_dpi and options.source_dpi > options.max_dpi:
+        scale = options.max_dpi / options.source_dpi
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.Resampling.LANCZOS)
+    if options.palette_colors:
+        image = image.quantize(colors=options.palette_colors)
+    return image
+
+
+def encode_png(image):
+    """Encode an image to optimized PNG bytes without touching the disk."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
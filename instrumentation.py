@@ -0,0 +1,147 @@
+# instrumentation.py
+"""Per-stage latency tracking for the capture pipeline.
+
+Code wraps each stage in `timings.stage(name)`; the Diagnostics tab and
+`Timings.export_json` read the rolling percentiles back out. Set
+PROFILE_DIR to also dump a cProfile of each profiled capture there.
+"""
+import cProfile
+import datetime
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Known stages, in pipeline order (other names are accepted and listed after these)
+STAGES = (
+    "grab",  # ImageGrab.grab
+    "save",  # Encoding and writing the blob
+    "hash",  # Perceptual hash and near-duplicate lookup
+    "cache_lookup",  # OCR cache check
+    "preprocess",  # Shrinking the image before OCR
+    "tiling",  # Finding band cuts in tall images
+    "ocr_call",  # Backend call, including rate limiting and retries
+    "encode",  # PNG encoding of the request payload
+    "upload",  # genai.upload_file for oversized payloads
+    "generate",  # A single generate_content attempt
+    "commit",  # Waiting for the row to be committed
+    "notify",  # Subscriber callbacks
+    "refresh",  # Reloading the history table
+    "capture_total",  # Grab to committed row
+    "watch_diff",  # Change detection on one watched frame
+)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class StageHistogram:
+    """The most recent `window` durations of one stage."""
+
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    def summary(self):
+        values = sorted(self.samples)
+        return {
+            "count": self.count,
+            "last_ms": self.samples[-1] * 1000 if self.samples else None,
+            "p50_ms": _ms(percentile(values, 0.50)),
+            "p95_ms": _ms(percentile(values, 0.95)),
+            "p99_ms": _ms(percentile(values, 0.99)),
+            "max_ms": _ms(values[-1] if values else None),
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+class Timings:
+    """Thread-safe rolling latency histograms keyed by stage name."""
+
+    def __init__(self, window=500, profile_dir=None):
+        self.window = window
+        self.profile_dir = profile_dir  # Dump cProfile stats of `profiled` blocks here when set
+        self._histograms = {}
+        self._lock = threading.Lock()
+        # cProfile can only have one active profiler per process
+        self._profile_lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = StageHistogram(self.window)
+            histogram.add(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block with a monotonic clock."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    @contextmanager
+    def profiled(self, name):
+        """Run the block under cProfile when `profile_dir` is set.
+
+        Blocks running while another one is being profiled are not profiled.
+        """
+        if not self.profile_dir or not self._profile_lock.acquire(blocking=False):
+            yield
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                yield
+            finally:
+                profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{name}_{stamp}.prof"))
+        finally:
+            self._profile_lock.release()
+
+    def snapshot(self):
+        """Summaries of every stage seen so far, known stages first."""
+        with self._lock:
+            summaries = {name: histogram.summary() for name, histogram in self._histograms.items()}
+        order = {name: i for i, name in enumerate(STAGES)}
+        return dict(sorted(summaries.items(), key=lambda item: (order.get(item[0], len(STAGES)), item[0])))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export_json(self, path, extra=None):
+        """Write the current snapshot (plus any `extra` sections) to a JSON file."""
+        report = {
+            "exported_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "stages": self.snapshot(),
+        }
+        if extra:
+            report.update(extra)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+# Shared by the whole process, like db.engine
+timings = Timings(profile_dir=os.getenv("PROFILE_DIR") or None)
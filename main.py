@@ -1,31 +1,124 @@
 # main.py
-from pynput import keyboard
+import os
+import threading
+import time
+from concurrent.futures import Future
+from tkinter import messagebox
 from config import Config
-from screenshot_manager import ScreenshotManager
 from ui.main_window import MainWindow
 from ui.screenshot_overlay import ScreenshotOverlay
-from ocr import OCR
+
+STARTUP_POLL_MS = 20  # How often the Tk loop checks whether background startup finished
+
+
+def load_services(config):
+    """Set up the database, OCR client and capture pipeline.
+
+    Runs on a background thread after the window is shown, so SQLAlchemy,
+    PIL, the Gemini SDK and pynput are imported off the critical path.
+    Also prefetches the newest history rows.
+    """
+    from pynput import keyboard
+    from db import ScopedSession, init_db
+    from screenshot_manager import ScreenshotManager
+    from ocr import OCR
+    from thumbnail_cache import ThumbnailCache
+    from blob_store import BlobStore
+
+    init_db()
+    ocr_model = OCR.from_config(config)
+    screenshot_manager = ScreenshotManager(
+        ocr_model,
+        max_workers=config.ocr_max_workers,
+        thumbnail_cache=ThumbnailCache(cache_dir=config.thumbnail_dir),
+        blob_store=BlobStore.from_config(config),
+        max_attempts=config.ocr_job_max_attempts,
+        retry_delay=config.ocr_job_retry_delay,
+        reuse_distance=config.ocr_reuse_distance
+    )
+    screenshot_manager.hash_index.load()
+    history_rows = screenshot_manager.get_history_window(limit=MainWindow.FETCH_SIZE)
+    ScopedSession.remove()  # This thread's session isn't used again
+    return screenshot_manager, history_rows, keyboard
+
+
+def start_api_server(config, screenshot_manager):
+    """Serve the local API from a background thread; the Tk loop keeps polling the OCR jobs."""
+    from api_server import ApiServer
+    server = ApiServer(
+        screenshot_manager,
+        host=config.api_host,
+        port=config.api_port,
+        unix_socket=config.api_socket or None,
+        token=config.api_token or None
+    )
+    try:
+        server.start_in_thread()
+    except OSError as e:
+        messagebox.showwarning("API Server", f"Could not start the API server on {server.address}: {e}")
+        return None
+    return server
+
+
+def report_startup(event, started):
+    """Print a startup milestone for startup_benchmark.py."""
+    print(f"STARTUP {event} {time.time() - started:.4f}", flush=True)
+
 
 def main():
-    # Initialize components
+    # Set by startup_benchmark.py to the wall-clock time the process was launched
+    benchmark_started = os.getenv("STARTUP_BENCHMARK_T0")
+
     config = Config()
-    ocr_model = OCR(api_key=config.gemini_api_key)
-    screenshot_manager = ScreenshotManager(ocr_model)
-    
-    # Create main window
-    app = MainWindow(config, screenshot_manager)
-    
-    # Setup hotkey handler
+
+    # Create main window first; everything heavy loads once it is on screen
+    app = MainWindow(config)
+    if benchmark_started:
+        app.root.after_idle(report_startup, "first_frame", float(benchmark_started))
+
+    services = Future()
+
+    def load_in_background():
+        try:
+            services.set_result(load_services(config))
+        except Exception as e:
+            services.set_exception(e)
+
     def on_activate():
-        overlay = ScreenshotOverlay(app.root, screenshot_manager.capture_screenshot)
+        overlay = ScreenshotOverlay(app.root, app.capture_region, freeze_frame=config.freeze_frame,
+                                    on_regions=app.capture_regions)
         app.root.after(0, overlay.show)
-    
-    # Register global hotkey
-    hotkey = keyboard.GlobalHotKeys({'<ctrl>+m': on_activate})
-    hotkey.start()
-    
+
+    def wait_for_services():
+        if not services.done():
+            app.root.after(STARTUP_POLL_MS, wait_for_services)
+            return
+        try:
+            screenshot_manager, history_rows, keyboard = services.result()
+        except Exception as e:
+            messagebox.showerror("Startup Error", f"Failed to initialise: {e}")
+            app.root.destroy()
+            return
+        app.attach_screenshot_manager(screenshot_manager, history_rows)
+        # Captures left unfinished by the last session are OCRed now
+        screenshot_manager.resume_jobs()
+        if config.api_server:
+            start_api_server(config, screenshot_manager)
+
+        # Register global hotkey
+        hotkey = keyboard.GlobalHotKeys({'<ctrl>+m': on_activate})
+        hotkey.start()
+        if benchmark_started:
+            report_startup("ready", float(benchmark_started))
+            if os.getenv("STARTUP_BENCHMARK_EXIT"):
+                app.root.after_idle(app.root.destroy)
+
+    # Idle callbacks run after the pending window drawing, so the first frame isn't delayed
+    app.root.after_idle(lambda: threading.Thread(target=load_in_background, name="startup", daemon=True).start())
+    app.root.after(STARTUP_POLL_MS, wait_for_services)
+
     # Start the application
     app.start()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
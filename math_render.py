@@ -0,0 +1,137 @@
+# math_render.py
+"""Render the LaTeX in OCR text to images for the viewer.
+
+Formulas are drawn with matplotlib's mathtext, which is optional: without
+matplotlib the viewer only shows the raw text. Renders are cached as PNG
+files keyed by the formula, so a formula seen before opens without being
+rendered again, even after a restart.
+"""
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+
+# $$display$$ or $inline$, skipping escaped dollars. Like pandoc, inline math
+# can't start or end with whitespace, be followed by a digit or cross a blank
+# line, so prose such as "$5 and $10" stays text.
+MATH_SPAN_RE = re.compile(
+    r"(?<!\\)\$\$(.+?)(?<!\\)\$\$"
+    r"|(?<![\\$])\$(?![\s$])((?:\\.|[^$\\\n]|\n(?![ \t]*\n))+?)(?<!\s)\$(?!\d)",
+    re.S
+)
+
+
+def split_math(text):
+    """Split text into ("text", s), ("inline", latex) and ("display", latex) segments."""
+    segments = []
+    position = 0
+    for match in MATH_SPAN_RE.finditer(text):
+        if match.start() > position:
+            segments.append(("text", text[position:match.start()]))
+        if match.group(1) is not None:
+            segments.append(("display", match.group(1).strip()))
+        else:
+            segments.append(("inline", match.group(2).strip()))
+        position = match.end()
+    if position < len(text):
+        segments.append(("text", text[position:]))
+    return segments
+
+
+class MathRenderer:
+    """Renders formulas on a background thread and caches the results.
+
+    Rendered PNGs are kept in `cache_dir`, and the Tk `PhotoImage`s made
+    from them in an in-memory LRU. Formulas mathtext can't parse are
+    remembered so they are not retried. Callers that display a photo must
+    keep their own reference, since the LRU may drop it at any time.
+    """
+
+    def __init__(self, cache_dir="math_renders", font_size=14, dpi=110, max_photos=256):
+        self.cache_dir = cache_dir
+        self.font_size = font_size
+        self.dpi = dpi
+        self.max_photos = max_photos
+        self.available = find_spec("matplotlib") is not None
+        self._photos = OrderedDict()  # key -> PhotoImage, only touched on the Tk thread
+        self._errors = {}  # key -> why the formula could not be rendered
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="math-render")
+        self._lock = threading.Lock()
+
+    def _size(self, display):
+        return self.font_size * 1.25 if display else self.font_size
+
+    def cache_key(self, latex, display=False):
+        source = f"{latex}\0{self._size(display)}\0{self.dpi}"
+        return hashlib.sha1(source.encode()).hexdigest()
+
+    def render_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def ensure_render(self, latex, display=False):
+        """Return the cached PNG path for latex, rendering it if needed.
+
+        Raises ValueError if mathtext can't parse the formula.
+        """
+        key = self.cache_key(latex, display)
+        path = self.render_path(key)
+        if os.path.exists(path):
+            return path
+        if key in self._errors:
+            raise ValueError(self._errors[key])
+        with self._lock:
+            if os.path.exists(path):
+                return path
+            from matplotlib import mathtext
+            from matplotlib.font_manager import FontProperties
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            # mathtext has no line breaks, so multi-line display math is joined
+            source = "$" + " ".join(latex.split()) + "$"
+            try:
+                mathtext.math_to_image(source, tmp_path, format="png", dpi=self.dpi,
+                                       prop=FontProperties(size=self._size(display)))
+            except ValueError as e:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                lines = str(e).strip().splitlines()
+                self._errors[key] = lines[-1] if lines else "Unsupported formula"
+                raise ValueError(self._errors[key]) from e
+            os.replace(tmp_path, path)
+            return path
+
+    def render_async(self, latex, display=False):
+        """Render in the background; returns a Future of the PNG path."""
+        return self._executor.submit(self.ensure_render, latex, display)
+
+    def cached_photo(self, latex, display=False):
+        """The `PhotoImage` for latex if it was rendered before, else None. Tk thread only."""
+        key = self.cache_key(latex, display)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        path = self.render_path(key)
+        if not os.path.exists(path):
+            return None
+        return self._load_photo(key, path)
+
+    def photo_for(self, latex, display, path):
+        """The `PhotoImage` for a finished render at path. Tk thread only."""
+        key = self.cache_key(latex, display)
+        return self._photos.get(key) or self._load_photo(key, path)
+
+    def _load_photo(self, key, path):
+        from PIL import Image, ImageTk
+        with Image.open(path) as image:
+            photo = ImageTk.PhotoImage(image)
+        self._photos[key] = photo
+        while len(self._photos) > self.max_photos:
+            self._photos.popitem(last=False)
+        return photo
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,37 +1,208 @@
-import google.generativeai as genai
-import os
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from image_preprocess import PreprocessOptions, preprocess
+from instrumentation import timings
+from ocr_backends import GeminiBackend, create_backend
+from ocr_cache import OCRCache
+from rate_limit import TokenBucket
+from resilience import CircuitBreaker, RequestCoalescer, ResilientCaller, RetryPolicy
+from tiling import TilingOptions, split_bands, stitch_texts
+
+PROMPT = "Extract text from the image without changing the content. Please use $...$ or $$...$$ to denote math expressions."
+
+BATCH_PROMPT = (
+    "You are given {count} numbered images. For each image: " + PROMPT + " "
+    'Answer with a JSON array containing one {{"image": <number>, "text": <extracted text>}} object per image.'
+)
 
 
 class OCR:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, cache=None, preprocess_options=None, backend=None, caller=None, tiling=None):
+        self.prompt = PROMPT
+        self.cache = cache  # Optional OCRCache consulted before calling the model
+        self.preprocess_options = preprocess_options or PreprocessOptions()
+        # Tall images are split into bands that are OCRed in parallel
+        self.tiling = tiling or TilingOptions()
+        # Rate limiting, retries and circuit breaking shared by every call on this client
+        self.caller = caller or ResilientCaller()
+        # Concurrent requests for the same image share a single backend call
+        self.coalescer = RequestCoalescer()
+        if backend is not None:
+            self.api_key = api_key
+            self.backend = backend
+            return
         if api_key is None:
+            self.api_key = ""
             try:
                 with open(".env", "r") as f:
                     for line in f:
                         if "GEMINI_API_KEY" in line:
-                            self.api_key = line.split("=")[1]
+                            self.api_key = line.split("=")[1].strip()
                             break
             except Exception as e:
-                self.api_key = ""
+                pass
         else:
             self.api_key = api_key
-            genai.configure(api_key=self.api_key)
-            # supported_models = genai.list_models()
-            # for model in supported_models:
-            #     print(model)
-            self.model = genai.GenerativeModel("models/gemini-2.0-flash-exp")
-
-    def extract_text(self, image_path):
-        prompt = "Extract text from the image without changing the content. Please use $...$ or $$...$$ to denote math expressions."
-        
-        myfile = genai.upload_file(image_path)
-        
-        response = self.model.generate_content(
-            contents=[
-                prompt,
-                myfile
-            ]
+        self.backend = GeminiBackend(self.api_key)
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    @classmethod
+    def from_config(cls, config):
+        """Build an OCR client with the backend, cache and preprocessing set up in `config`."""
+        cache = OCRCache(
+            max_memory_entries=config.ocr_cache_memory_entries,
+            max_db_entries=config.ocr_cache_max_entries,
+            max_age_days=config.ocr_cache_max_age_days
+        )
+        caller = ResilientCaller(
+            rate_limiter=TokenBucket(config.ocr_rate_limit, config.ocr_burst) if config.ocr_rate_limit else None,
+            retry_policy=RetryPolicy(max_attempts=config.ocr_max_attempts),
+            circuit_breaker=CircuitBreaker(
+                failure_threshold=config.ocr_circuit_failures,
+                reset_timeout=config.ocr_circuit_reset_seconds
+            )
         )
+        return cls(
+            api_key=config.gemini_api_key,
+            cache=cache,
+            preprocess_options=PreprocessOptions.from_config(config),
+            backend=create_backend(config),
+            caller=caller,
+            tiling=TilingOptions.from_config(config)
+        )
+
+    def set_api_key(self, api_key):
+        """Switch to a new Gemini key; other backends don't use one."""
+        self.api_key = api_key
+        if isinstance(self.backend, GeminiBackend):
+            self.backend = GeminiBackend(api_key, model_name=self.backend.model_name, timeout=self.backend.timeout)
+
+    def stats(self):
+        """Call, retry and cache counters for diagnostics."""
+        stats = {
+            "backend": self.backend.name,
+            "calls": self.caller.stats.snapshot(),
+            "circuit_state": self.caller.circuit_breaker.state,
+            "coalesced": self.coalescer.coalesced,
+        }
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        return stats
+
+    @staticmethod
+    def _load_image(image):
+        if isinstance(image, Image.Image):
+            return image
+        with Image.open(image) as f:
+            return f.copy()
+
+    def extract_text(self, image, refresh=False):
+        """Extract text from a PIL image or an image file path.
+
+        With `refresh` the cache is not consulted, only updated with the new result.
+        """
+        image = self._load_image(image)
+        with timings.stage("cache_lookup"):
+            cache_key = OCRCache.make_key(image, self.prompt, self.model_name)
+            cached = self.cache.get(cache_key) if self.cache is not None and not refresh else None
+        if cached is not None:
+            return cached
+
+        return self.coalescer.run(cache_key, lambda: self._extract_uncached(image, cache_key))
+
+    def _extract_uncached(self, image, cache_key):
+        if self.tiling.should_tile(image):
+            text = self.extract_tiled(image, self.tiling)
+        else:
+            text = self.extract_single(image)
+        if self.cache is not None:
+            self.cache.put(cache_key, text)
+        return text
+
+    def extract_single(self, image):
+        """Call the backend through the shared rate limiter, retries and circuit breaker."""
+        with timings.stage("preprocess"):
+            image = preprocess(image, self.preprocess_options)
+        with timings.stage("ocr_call"):
+            return self.caller.call(self.backend.extract, image, self.prompt)
+
+    def extract_tiled(self, image, options):
+        """OCR horizontal bands of image concurrently and stitch the results (see tiling.py)."""
+        with timings.stage("tiling"):
+            bands = split_bands(image, options)
+        if len(bands) == 1:
+            return self.extract_single(image)
+        with ThreadPoolExecutor(max_workers=min(len(bands), options.max_workers),
+                                thread_name_prefix="ocr-band") as executor:
+            texts = list(executor.map(self.extract_single, bands))
+        return stitch_texts(texts)
+
+    def extract_texts(self, images, refresh=False):
+        """Extract text from several images with a single backend request.
+
+        Cached images are skipped unless `refresh` is set; returns the texts
+        in the order given.
+        """
+        images = [self._load_image(image) for image in images]
+        texts = [None] * len(images)
+        missing = []  # (index, cache key) of images that need OCR
+        with timings.stage("cache_lookup"):
+            for index, image in enumerate(images):
+                cache_key = OCRCache.make_key(image, self.prompt, self.model_name)
+                texts[index] = self.cache.get(cache_key) if self.cache is not None and not refresh else None
+                if texts[index] is None:
+                    missing.append((index, cache_key))
+        if not missing:
+            return texts
+
+        with timings.stage("preprocess"):
+            batch = [preprocess(images[index], self.preprocess_options) for index, cache_key in missing]
+        with timings.stage("ocr_call"):
+            if len(batch) == 1:
+                results = [self.caller.call(self.backend.extract, batch[0], self.prompt)]
+            else:
+                prompt = BATCH_PROMPT.format(count=len(batch))
+                results = self.caller.call(self.backend.extract_batch, batch, prompt)
+        for (index, cache_key), text in zip(missing, results):
+            texts[index] = text
+            if self.cache is not None:
+                self.cache.put(cache_key, text)
+        return texts
+
+    def stream_text(self, image, refresh=False):
+        """Yield the extracted text in chunks as the backend produces them.
+
+        A cached result comes back as a single chunk (unless `refresh` is
+        set). Retries only cover opening the stream; an error after the
+        first chunk is raised as is.
+        """
+        image = self._load_image(image)
+        with timings.stage("cache_lookup"):
+            cache_key = OCRCache.make_key(image, self.prompt, self.model_name)
+            cached = self.cache.get(cache_key) if self.cache is not None and not refresh else None
+        if cached is not None:
+            yield cached
+            return
+        if self.tiling.should_tile(image):
+            # Bands finish out of order, so tiled results arrive in one piece
+            yield self.extract_text(image, refresh)
+            return
+
+        with timings.stage("preprocess"):
+            image = preprocess(image, self.preprocess_options)
+        parts = []
+        for chunk in self.caller.call(self._open_stream, image):
+            parts.append(chunk)
+            yield chunk
+        if self.cache is not None:
+            self.cache.put(cache_key, "".join(parts))
 
-        return response.parts[0].text
-        
\ No newline at end of file
+    def _open_stream(self, image):
+        """Start a backend stream and wait for its first chunk, so connection errors get retried."""
+        stream = iter(self.backend.stream(image, self.prompt))
+        first = next(stream, None)
+        return itertools.chain([] if first is None else [first], stream)
@@ -0,0 +1,202 @@
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+from image_preprocess import encode_png
+from instrumentation import timings
+
+GEMINI_MODEL_NAME = "models/gemini-2.0-flash-exp"
+
+
+class OCRBackend:
+    """Turns a (preprocessed) PIL image into text.
+
+    `model_name` takes part in OCR cache keys, so results from different
+    backends never mix.
+    """
+
+    name = "base"
+    model_name = "base"
+
+    def extract(self, image, prompt):
+        raise NotImplementedError
+
+    def stream(self, image, prompt):
+        """Yield the text in chunks as it is produced. Defaults to a single chunk."""
+        yield self.extract(image, prompt)
+
+    def extract_batch(self, images, prompt):
+        """Return one text per image. Defaults to one `extract` call per image."""
+        return [self.extract(image, prompt) for image in images]
+
+
+def parse_batch_response(payload, count):
+    """Read `[{"image": n, "text": "..."}, ...]` (n counting from 1) into a list of texts."""
+    try:
+        items = json.loads(payload)
+        texts = {int(item["image"]): item["text"] for item in items}
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Malformed batch OCR response: {e}")
+    missing = [number for number in range(1, count + 1) if number not in texts]
+    if missing:
+        raise ValueError(f"Batch OCR response is missing image(s) {missing}")
+    return [texts[number] for number in range(1, count + 1)]
+
+
+class GeminiBackend(OCRBackend):
+    name = "gemini"
+
+    # Gemini rejects requests above 20 MB, larger payloads go through the File API
+    INLINE_LIMIT_BYTES = 20 * 1024 * 1024
+
+    def __init__(self, api_key, model_name=GEMINI_MODEL_NAME, timeout=60):
+        import google.generativeai as genai  # Only needed when Gemini is actually used
+        self.genai = genai
+        self.model_name = model_name
+        self.timeout = timeout
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def _image_part(self, image):
+        with timings.stage("encode"):
+            payload = encode_png(image)
+        if len(payload) <= self.INLINE_LIMIT_BYTES:
+            return {"mime_type": "image/png", "data": payload}
+        with timings.stage("upload"):
+            return self.genai.upload_file(io.BytesIO(payload), mime_type="image/png")
+
+    def extract(self, image, prompt):
+        image_part = self._image_part(image)
+        with timings.stage("generate"):
+            response = self.model.generate_content(
+                contents=[
+                    prompt,
+                    image_part
+                ],
+                request_options={"timeout": self.timeout}
+            )
+        return response.parts[0].text
+
+    def extract_batch(self, images, prompt):
+        """All images in one request; the model answers with a JSON array of texts."""
+        contents = [prompt]
+        for number, image in enumerate(images, 1):
+            contents.append(f"Image {number}:")
+            contents.append(self._image_part(image))
+        with timings.stage("generate"):
+            response = self.model.generate_content(
+                contents=contents,
+                generation_config={"response_mime_type": "application/json"},
+                request_options={"timeout": self.timeout}
+            )
+        return parse_batch_response(response.parts[0].text, len(images))
+
+    def stream(self, image, prompt):
+        response = self.model.generate_content(
+            contents=[
+                prompt,
+                self._image_part(image)
+            ],
+            stream=True,
+            request_options={"timeout": self.timeout}
+        )
+        for chunk in response:
+            if chunk.parts:
+                yield chunk.text
+
+
+class FakeBackend(OCRBackend):
+    """Deterministic offline stand-in for load testing the rest of the pipeline.
+
+    Returns a placeholder formula derived from the image pixels after
+    sleeping `latency` (+/- `jitter`) seconds, and fails a `failure_rate`
+    fraction of calls. Both are driven by a seeded RNG so runs are repeatable.
+    """
+
+    name = "fake"
+    model_name = "fake"
+
+    def __init__(self, latency=0.5, jitter=0.0, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _start_call(self):
+        """Count the call and decide its delay and whether it fails."""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.failure_rate
+        return delay, fail
+
+    def extract(self, image, prompt):
+        delay, fail = self._start_call()
+        time.sleep(delay)
+        if fail:
+            # A connection error, so injected failures exercise the retry path
+            raise ConnectionError("Injected OCR failure")
+        return self._fake_text(image)
+
+    def stream(self, image, prompt):
+        delay, fail = self._start_call()
+        words = self._fake_text(image).split(" ")
+        # Spread the latency over the chunks, like a real streaming response
+        for i, word in enumerate(words):
+            time.sleep(delay / len(words))
+            if fail:
+                raise ConnectionError("Injected OCR failure")
+            yield word if i == len(words) - 1 else word + " "
+
+    def extract_batch(self, images, prompt):
+        # One round trip for the whole batch
+        delay, fail = self._start_call()
+        time.sleep(delay)
+        if fail:
+            raise ConnectionError("Injected OCR failure")
+        return [self._fake_text(image) for image in images]
+
+    def _fake_text(self, image):
+        digest = hashlib.sha1(image.tobytes()).hexdigest()[:8]
+        return f"Fake OCR result {digest}: $$x_{{{image.width}}} + y_{{{image.height}}} = z$$"
+
+
+class TesseractBackend(OCRBackend):
+    """Local OCR through the Tesseract engine (needs `pytesseract` and the tesseract binary)."""
+
+    name = "tesseract"
+
+    def __init__(self, lang="eng"):
+        try:
+            import pytesseract
+        except ImportError:
+            raise RuntimeError("The tesseract backend requires the 'pytesseract' package.")
+        self.pytesseract = pytesseract
+        self.lang = lang
+        self.model_name = f"tesseract-{lang}"
+
+    def extract(self, image, prompt):
+        # Tesseract has no notion of a prompt and cannot read palette images
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("L")
+        return self.pytesseract.image_to_string(image, lang=self.lang).strip()
+
+
+def create_backend(config, api_key=None):
+    """Instantiate the backend selected by `config.ocr_backend`."""
+    if config.ocr_backend == "gemini":
+        return GeminiBackend(api_key if api_key is not None else config.gemini_api_key, timeout=config.ocr_timeout)
+    if config.ocr_backend == "fake":
+        return FakeBackend(
+            latency=config.fake_ocr_latency,
+            jitter=config.fake_ocr_jitter,
+            failure_rate=config.fake_ocr_failure_rate,
+            seed=config.fake_ocr_seed
+        )
+    if config.ocr_backend == "tesseract":
+        return TesseractBackend(lang=config.tesseract_lang)
+    raise ValueError(f"Unknown OCR backend: {config.ocr_backend!r}")
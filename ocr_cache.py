@@ -0,0 +1,126 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from db import Session, OCRCacheEntry
+
+
+class OCRCache:
+    """Two-tier cache of OCR results keyed by image content.
+
+    Lookups hit an in-memory LRU first and fall back to the `ocr_cache`
+    table, so identical captures are answered without calling the model
+    even across restarts.
+    """
+
+    EVICT_EVERY = 100  # Run persistent eviction once per this many inserts
+
+    def __init__(self, max_memory_entries=256, max_db_entries=10000, max_age_days=90):
+        self.max_memory_entries = max_memory_entries
+        self.max_db_entries = max_db_entries
+        self.max_age = timedelta(days=max_age_days)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(image, prompt, model_name):
+        """Hash the decoded pixels (not the file bytes) together with prompt and model."""
+        digest = hashlib.sha256()
+        digest.update(f"{image.mode}:{image.size[0]}x{image.size[1]}".encode())
+        digest.update(image.tobytes())
+        digest.update(prompt.encode())
+        digest.update(model_name.encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached text for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        session = Session()
+        try:
+            entry = session.get(OCRCacheEntry, key)
+            if entry is None or entry.last_used_at < datetime.now() - self.max_age:
+                with self._lock:
+                    self.misses += 1
+                return None
+            entry.last_used_at = datetime.now()
+            text = entry.text
+            session.commit()
+        finally:
+            session.close()
+
+        with self._lock:
+            self.db_hits += 1
+            self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        """Store text for key in both tiers."""
+        with self._lock:
+            self._remember(key, text)
+            self._puts += 1
+            should_evict = self._puts % self.EVICT_EVERY == 0
+
+        session = Session()
+        try:
+            session.merge(OCRCacheEntry(key=key, text=text, last_used_at=datetime.now()))
+            session.commit()
+        finally:
+            session.close()
+
+        if should_evict:
+            self.evict()
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def evict(self):
+        """Drop persistent entries that are too old or beyond the size limit."""
+        session = Session()
+        try:
+            cutoff = datetime.now() - self.max_age
+            session.query(OCRCacheEntry).filter(OCRCacheEntry.last_used_at < cutoff).delete()
+            overflow = session.query(OCRCacheEntry).count() - self.max_db_entries
+            if overflow > 0:
+                stale_keys = (session.query(OCRCacheEntry.key)
+                              .order_by(OCRCacheEntry.last_used_at)
+                              .limit(overflow))
+                session.query(OCRCacheEntry).filter(OCRCacheEntry.key.in_(stale_keys.scalar_subquery())).delete(synchronize_session=False)
+            session.commit()
+        finally:
+            session.close()
+
+    def clear(self):
+        """Empty both tiers and reset the counters."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+        session = Session()
+        try:
+            session.query(OCRCacheEntry).delete()
+            session.commit()
+        finally:
+            session.close()
+
+    def stats(self):
+        """Hit/miss counters and current sizes."""
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+            }
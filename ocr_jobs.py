@@ -0,0 +1,328 @@
+# ocr_jobs.py
+"""Durable OCR job queue backed by the screenshots table.
+
+Captures are committed with status 'queued' before any OCR happens and
+`OCRJobQueue` works through them with bounded concurrency, so a capture
+is never lost to a missing key, a dropped connection or a closed app.
+Rows left queued or running by a previous run are picked up by `resume()`.
+
+`python ocr_jobs.py requeue --failed` (or `--older-than DAYS`) marks rows
+for re-OCR; `python ocr_jobs.py drain` processes the queue without the GUI.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from db import Session, ScreenShot
+from instrumentation import timings
+from resilience import CircuitOpenError, is_retryable
+
+
+class OCRJobError(RuntimeError):
+    """OCR of a job failed; `retry` says whether it will be tried again."""
+
+    def __init__(self, error, retry):
+        super().__init__(str(error) or type(error).__name__)
+        self.retry = retry
+
+
+class OCRJob:
+    """Screenshot rows OCRed together in one request.
+
+    `images` are the in-memory captures when still available; otherwise
+    the stored files are read. `refresh` jobs re-OCR rows that already
+    have text, so the OCR cache is bypassed.
+    """
+
+    def __init__(self, screenshot_ids, images=None, on_chunk=None, on_finished=None, started=None, refresh=False):
+        self.screenshot_ids = list(screenshot_ids)
+        self.images = images
+        self.on_chunk = on_chunk  # Streams OCR output of single-image jobs to the Tk thread
+        self.on_finished = on_finished  # Called with (screenshot_ids, error) on the Tk thread
+        self.started = started  # perf_counter() of the capture, for the capture_total timing
+        self.refresh = refresh
+
+
+def _update_rows(screenshot_ids, values):
+    session = Session()
+    try:
+        (session.query(ScreenShot)
+         .filter(ScreenShot.id.in_(screenshot_ids))
+         .update(values, synchronize_session=False))
+        session.commit()
+    finally:
+        session.close()
+
+
+def requeue_screenshots(status=None, older_than=None, screenshot_ids=None):
+    """Mark finished rows for another OCR pass and return their ids.
+
+    Selects rows by status, by `created_at` before `older_than`, and/or by
+    id. Rows already queued or running are left alone. The old text is
+    kept until the new result replaces it.
+    """
+    session = Session()
+    try:
+        query = session.query(ScreenShot.id).filter(
+            ScreenShot.status.notin_([ScreenShot.QUEUED, ScreenShot.RUNNING]))
+        if status is not None:
+            query = query.filter(ScreenShot.status == status)
+        if older_than is not None:
+            query = query.filter(ScreenShot.created_at < older_than)
+        if screenshot_ids is not None:
+            query = query.filter(ScreenShot.id.in_(list(screenshot_ids)))
+        ids = [screenshot_id for (screenshot_id,) in query.order_by(ScreenShot.id)]
+        if ids:
+            (session.query(ScreenShot)
+             .filter(ScreenShot.id.in_(ids))
+             .update({
+                 ScreenShot.status: ScreenShot.QUEUED,
+                 ScreenShot.attempts: 0,
+                 ScreenShot.last_error: None,
+                 ScreenShot.updated_at: datetime.now()
+             }, synchronize_session=False))
+            session.commit()
+        return ids
+    finally:
+        session.close()
+
+
+class OCRJobQueue:
+    """Feeds queued screenshot rows to a WorkerPool, at most `max_in_flight` at a time.
+
+    Everything except the OCR itself runs on the thread calling
+    `worker_pool.poll()`. Failures that look temporary are retried after
+    `retry_delay` seconds, up to `max_attempts` attempts per row.
+    """
+
+    def __init__(self, ocr_model, worker_pool, max_in_flight=2, max_attempts=3, retry_delay=30.0,
+                 on_change=None):
+        self.ocr_model = ocr_model
+        self.worker_pool = worker_pool
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.on_change = on_change  # Called with a list of changed screenshot ids
+        self._backlog = deque()
+        self._retry_timers = set()
+        self._stopped = False
+        self.in_flight = 0
+
+    @property
+    def idle(self):
+        return not self._backlog and not self.in_flight and not self._retry_timers
+
+    def enqueue(self, screenshot_ids, images=None, on_chunk=None, on_finished=None, started=None, refresh=False):
+        """Queue already committed rows for OCR; `refresh` skips the OCR cache."""
+        self._backlog.append(OCRJob(screenshot_ids, images, on_chunk, on_finished, started, refresh))
+        self._dispatch()
+
+    def resume(self):
+        """Queue rows left queued or running by a previous run; returns how many.
+
+        Rows that still have text were requeued for re-OCR, so they skip the cache.
+        """
+        session = Session()
+        try:
+            (session.query(ScreenShot)
+             .filter(ScreenShot.status == ScreenShot.RUNNING)
+             .update({ScreenShot.status: ScreenShot.QUEUED}, synchronize_session=False))
+            session.commit()
+            rows = (session.query(ScreenShot.id, ScreenShot.text.isnot(None))
+                    .filter(ScreenShot.status == ScreenShot.QUEUED)
+                    .order_by(ScreenShot.id)
+                    .all())
+        finally:
+            session.close()
+        for screenshot_id, refresh in rows:
+            self.enqueue([screenshot_id], refresh=bool(refresh))
+        return len(rows)
+
+    def requeue(self, status=None, older_than=None, screenshot_ids=None):
+        """Re-OCR finished rows (see `requeue_screenshots`); returns their ids."""
+        ids = requeue_screenshots(status=status, older_than=older_than, screenshot_ids=screenshot_ids)
+        for screenshot_id in ids:
+            self.enqueue([screenshot_id], refresh=True)
+        return ids
+
+    def stats(self):
+        return {"backlog": len(self._backlog), "in_flight": self.in_flight, "retrying": len(self._retry_timers)}
+
+    def stop(self):
+        """Stop dispatching. Unfinished rows stay queued in the database for `resume`."""
+        self._stopped = True
+        self._backlog.clear()
+        for timer in list(self._retry_timers):
+            timer.cancel()
+        self._retry_timers.clear()
+
+    def _dispatch(self):
+        while self._backlog and self.in_flight < self.max_in_flight and not self._stopped:
+            job = self._backlog.popleft()
+            self.in_flight += 1
+            self.worker_pool.submit(self.process, job,
+                                    on_done=lambda job_id, future, job=job: self._on_done(job, future))
+
+    def process(self, job):
+        """OCR a job and store the results. Runs on a worker thread (or inline).
+
+        On failure the rows are marked failed, or queued again if the error
+        is temporary and attempts remain, and OCRJobError is raised.
+        """
+        ids = job.screenshot_ids
+        _update_rows(ids, {
+            ScreenShot.status: ScreenShot.RUNNING,
+            ScreenShot.attempts: ScreenShot.attempts + 1,
+            ScreenShot.updated_at: datetime.now()
+        })
+        self._post_change(ids)
+        session = Session()
+        try:
+            rows = {row.id: row for row in session.query(ScreenShot.id, ScreenShot.stored_at, ScreenShot.attempts)
+                    .filter(ScreenShot.id.in_(ids))}
+        finally:
+            session.close()
+        try:
+            # Rows deleted in the meantime are dropped from the job
+            if job.images is not None:
+                images = [image for screenshot_id, image in zip(ids, job.images) if screenshot_id in rows]
+            else:
+                images = [rows[screenshot_id].stored_at for screenshot_id in ids if screenshot_id in rows]
+            ids = [screenshot_id for screenshot_id in ids if screenshot_id in rows]
+            texts = self._extract(images, job.on_chunk, job.refresh)
+        except Exception as e:
+            retry = self._should_retry(e) and max((row.attempts for row in rows.values()), default=0) < self.max_attempts
+            _update_rows(ids, {
+                ScreenShot.status: ScreenShot.QUEUED if retry else ScreenShot.FAILED,
+                ScreenShot.last_error: str(e) or type(e).__name__,
+                ScreenShot.updated_at: datetime.now()
+            })
+            raise OCRJobError(e, retry) from e
+
+        session = Session()
+        try:
+            # All rows of a job are updated in one transaction
+            for screenshot_id, text in zip(ids, texts):
+                (session.query(ScreenShot)
+                 .filter(ScreenShot.id == screenshot_id)
+                 .update({
+                     ScreenShot.text: text,
+                     ScreenShot.status: ScreenShot.DONE,
+                     ScreenShot.last_error: None,
+                     ScreenShot.updated_at: datetime.now()
+                 }, synchronize_session=False))
+            with timings.stage("commit"):
+                session.commit()
+        finally:
+            session.close()
+        if job.started is not None:
+            timings.record("capture_total", time.perf_counter() - job.started)
+        return texts
+
+    def _extract(self, images, on_chunk=None, refresh=False):
+        if not images:
+            return []
+        if len(images) > 1:
+            return self.ocr_model.extract_texts(images, refresh=refresh)
+        if on_chunk is None:
+            return [self.ocr_model.extract_text(images[0], refresh=refresh)]
+        parts = []
+        for chunk in self.ocr_model.stream_text(images[0], refresh=refresh):
+            parts.append(chunk)
+            self.worker_pool.post(on_chunk, chunk)
+        return ["".join(parts)]
+
+    @staticmethod
+    def _should_retry(error):
+        # An open circuit breaker means the service is down for now, not that the job is bad
+        return is_retryable(error) or isinstance(error, CircuitOpenError)
+
+    def _post_change(self, ids):
+        if self.on_change is not None:
+            self.worker_pool.post(self.on_change, list(ids))
+
+    def _on_done(self, job, future):
+        self.in_flight -= 1
+        try:
+            future.result()
+            error = None
+        except Exception as e:
+            error = e
+            if isinstance(e, OCRJobError) and e.retry and not self._stopped:
+                self._schedule_retry(job.screenshot_ids, job.refresh)
+        try:
+            if self.on_change is not None:
+                self.on_change(job.screenshot_ids)
+            if job.on_finished is not None:
+                job.on_finished(job.screenshot_ids, error)
+        finally:
+            # A failing callback must not stall the backlog
+            self._dispatch()
+
+    def _schedule_retry(self, screenshot_ids, refresh=False):
+        timer = threading.Timer(self.retry_delay,
+                                lambda: self.worker_pool.post(self._retry, timer, screenshot_ids, refresh))
+        timer.daemon = True
+        self._retry_timers.add(timer)
+        timer.start()
+
+    def _retry(self, timer, screenshot_ids, refresh):
+        if timer in self._retry_timers:  # Not cancelled by `stop`
+            self._retry_timers.discard(timer)
+            self.enqueue(screenshot_ids, refresh=refresh)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the OCR job queue.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    requeue_parser = subparsers.add_parser("requeue", help="Mark rows for another OCR pass")
+    requeue_parser.add_argument("--failed", action="store_true", help="Rows whose OCR failed")
+    requeue_parser.add_argument("--older-than", type=float, metavar="DAYS",
+                                help="Rows captured more than DAYS days ago")
+    drain_parser = subparsers.add_parser("drain", help="Process queued rows without the GUI, then exit")
+    drain_parser.add_argument("--workers", type=int, default=None, help="Concurrent OCR jobs (default: OCR_MAX_WORKERS)")
+    args = parser.parse_args(argv)
+
+    from config import Config
+    from db import init_db
+
+    init_db()
+    config = Config()
+    if args.command == "requeue":
+        if not args.failed and args.older_than is None:
+            parser.error("requeue needs --failed and/or --older-than")
+        older_than = datetime.now() - timedelta(days=args.older_than) if args.older_than is not None else None
+        ids = requeue_screenshots(status=ScreenShot.FAILED if args.failed else None, older_than=older_than)
+        print(f"Queued {len(ids)} screenshot(s) for OCR; they are processed on the next start or `drain`")
+        return 0
+
+    from ocr import OCR
+    from worker_pool import WorkerPool
+
+    workers = args.workers or config.ocr_max_workers
+    worker_pool = WorkerPool(max_workers=workers, max_pending=workers)
+    jobs = OCRJobQueue(OCR.from_config(config), worker_pool, max_in_flight=workers,
+                       max_attempts=config.ocr_job_max_attempts, retry_delay=config.ocr_job_retry_delay)
+    print(f"Resuming {jobs.resume()} queued screenshot(s)")
+    try:
+        while not jobs.idle:
+            worker_pool.poll()
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        print("Interrupted, unfinished rows stay queued", file=sys.stderr)
+        jobs.stop()
+    finally:
+        worker_pool.shutdown(wait=False)
+    session = Session()
+    try:
+        failed = session.query(ScreenShot.id).filter(ScreenShot.status == ScreenShot.FAILED).count()
+    finally:
+        session.close()
+    print(f"Done, {failed} screenshot(s) in failed state")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
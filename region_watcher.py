@@ -0,0 +1,132 @@
+# region_watcher.py
+"""Repeatedly capture a fixed screen region, but only when its content changes."""
+import threading
+import numpy as np
+from PIL import Image, ImageGrab
+from instrumentation import timings
+
+MAX_BACKOFF = 30.0  # Longest wait in seconds between polls after failed grabs
+
+
+class FrameDiff:
+    """Cheap change detection on small grayscale thumbnails of a frame.
+
+    Frames are box-downsampled so the longer side is at most `max_side`
+    pixels; two fingerprints differ by the fraction of thumbnail pixels
+    whose brightness moved by more than `pixel_threshold`.
+    """
+
+    def __init__(self, max_side=128, pixel_threshold=24):
+        self.max_side = max_side
+        self.pixel_threshold = pixel_threshold
+
+    def fingerprint(self, image):
+        scale = min(1.0, self.max_side / max(image.size))
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        small = image.convert("L").resize(size, Image.Resampling.BOX)
+        return np.asarray(small, dtype=np.int16)
+
+    def changed_fraction(self, a, b):
+        if a.shape != b.shape:
+            return 1.0
+        return np.count_nonzero(np.abs(a - b) > self.pixel_threshold) / a.size
+
+
+class RegionWatcher:
+    """Polls `bbox` every `interval` seconds and captures it when it changes.
+
+    A frame is captured once more than `change_threshold` of it differs from
+    the last captured frame and it has stopped changing since the previous
+    poll, so slide transitions and scrolling aren't captured half way.
+    Captures are handed to `ScreenshotManager.capture_screenshot_async` on
+    the thread calling `poll_jobs`.
+
+    A failed poll (e.g. the grab is denied) is counted and retried with
+    exponential backoff. After `max_errors` failures in a row, or as soon
+    as storing a capture fails, the watcher stops and
+    `on_error(watcher, error)` is called on that same thread.
+    """
+
+    def __init__(self, screenshot_manager, bbox, interval=0.5, change_threshold=0.02, frame_diff=None,
+                 max_errors=5, on_error=None):
+        self.screenshot_manager = screenshot_manager
+        self.bbox = bbox
+        self.interval = interval
+        self.change_threshold = change_threshold
+        self.frame_diff = frame_diff or FrameDiff()
+        self.max_errors = max_errors
+        self.on_error = on_error
+        self._stop = threading.Event()
+        self._thread = None
+        self._captured = None  # Fingerprint of the last frame sent for OCR
+        self._previous = None  # Fingerprint from the previous poll
+        self.polls = 0
+        self.captures = 0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="region-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        post = self.screenshot_manager.worker_pool.post
+        failures = 0  # In a row
+        while not self._stop.is_set():
+            try:
+                frame = ImageGrab.grab(bbox=self.bbox)
+                if self.check_frame(frame):
+                    post(self._capture, frame)
+                failures = 0
+            except Exception as e:
+                self.errors += 1
+                self.last_error = e
+                failures += 1
+                if failures >= self.max_errors:
+                    self._stop.set()
+                    if self.on_error is not None:
+                        post(self.on_error, self, e)
+                    return
+            self._stop.wait(min(self.interval * 2 ** failures, MAX_BACKOFF))
+
+    def check_frame(self, frame):
+        """Return True if frame should be captured, updating the watcher's state."""
+        self.polls += 1
+        with timings.stage("watch_diff"):
+            fingerprint = self.frame_diff.fingerprint(frame)
+            previous, self._previous = self._previous, fingerprint
+            if self._captured is not None and (
+                    self.frame_diff.changed_fraction(fingerprint, self._captured) <= self.change_threshold):
+                return False
+            if previous is None or self.frame_diff.changed_fraction(fingerprint, previous) > self.change_threshold:
+                return False  # Still changing, wait for it to settle
+        self._captured = fingerprint
+        return True
+
+    def _capture(self, frame):
+        if self._stop.is_set():
+            return
+        try:
+            self.screenshot_manager.capture_screenshot_async(self.bbox, image=frame)
+        except Exception as e:
+            # e.g. the blob store is full or the database is locked; don't break the poller
+            self.errors += 1
+            self.last_error = e
+            self._stop.set()
+            if self.on_error is not None:
+                self.on_error(self, e)
+            return
+        self.captures += 1
@@ -0,0 +1,196 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Exception class names (from google.api_core and friends) that mean "try again later".
+# Matched by name so this module doesn't have to import the Gemini SDK.
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",  # 429 quota
+    "TooManyRequests",
+    "ServiceUnavailable",  # 503
+    "InternalServerError",  # 500
+    "DeadlineExceeded",
+    "GatewayTimeout",
+    "RetryError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+def is_retryable(error):
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter."""
+
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt):
+        """Seconds to sleep after the given (1-based) failed attempt."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets one trial call through.
+
+    Closed: calls pass. After `failure_threshold` consecutive failures the
+    breaker opens and rejects calls for `reset_timeout` seconds, after which
+    a single half-open trial decides whether to close or re-open it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "closed":
+                return
+            if self.state == "open":
+                remaining = self._opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpenError(f"OCR service unavailable, retrying in {remaining:.1f}s")
+                self.state = "half_open"
+            if self._trial_in_flight:
+                raise CircuitOpenError("OCR service unavailable, waiting for a trial request")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+
+class RequestCoalescer:
+    """Lets concurrent callers with the same key share one in-flight call."""
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def run(self, key, fn):
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+
+class CallStats:
+    """Counters and recent per-attempt latencies for API calls."""
+
+    def __init__(self, window=500):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0  # Calls refused by the open circuit breaker
+
+    def record_attempt(self, seconds, ok):
+        with self._lock:
+            self.attempts += 1
+            self._latencies.append((seconds, ok))
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(seconds for seconds, ok in self._latencies)
+            return {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "last_attempt_seconds": self._latencies[-1][0] if self._latencies else None,
+                "median_attempt_seconds": latencies[len(latencies) // 2] if latencies else None,
+            }
+
+
+class ResilientCaller:
+    """Wraps API calls with a shared rate limiter, retries and a circuit breaker."""
+
+    def __init__(self, rate_limiter=None, retry_policy=None, circuit_breaker=None, stats=None):
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.stats = stats or CallStats()
+
+    def call(self, fn, *args):
+        self.stats.increment("calls")
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                self.circuit_breaker.before_call()
+            except CircuitOpenError:
+                self.stats.increment("rejected")
+                raise
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.monotonic()
+            try:
+                result = fn(*args)
+            except Exception as e:
+                self.stats.record_attempt(time.monotonic() - started, ok=False)
+                retryable = is_retryable(e)
+                if retryable:
+                    # Only service-side trouble counts against the breaker
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_success()
+                if not retryable or attempt >= self.retry_policy.max_attempts:
+                    self.stats.increment("failures")
+                    raise
+                self.stats.increment("retries")
+                time.sleep(self.retry_policy.delay(attempt))
+            else:
+                self.stats.record_attempt(time.monotonic() - started, ok=True)
+                self.circuit_breaker.record_success()
+                return result
@@ -1,17 +1,112 @@
-from PIL import ImageGrab
+from PIL import Image, ImageGrab
+import os
+import re
 import time
-from db import Session, ScreenShot
+from sqlalchemy import func, text as sql_text
+from db import ScopedSession, Session, ScreenShot, TableStats, fts_text
 from ocr import OCR
+from ocr_jobs import OCRJobQueue
 from datetime import datetime
+from worker_pool import WorkerPool
+from blob_store import BlobStore
+from image_hash import HashIndex, dhash, from_db, to_db
+from region_watcher import RegionWatcher
+from instrumentation import timings
+
+PREVIEW_CHARS = 120  # Length of the text preview loaded for history rows
+
+# Mirrors the FTS5 tokenizer on fts_text: word characters plus backslash (for LaTeX commands)
+SEARCH_TOKEN_RE = re.compile(r"[\\\w]+")
+
+
+def build_fts_query(query):
+    """Turn free text into an FTS5 MATCH expression.
+
+    Every term is quoted so FTS5 operators in user input are taken literally,
+    terms are ANDed together and the last one is matched as a prefix.
+    The query is split like the indexed text (see db.fts_text).
+    """
+    terms = SEARCH_TOKEN_RE.findall(fts_text(query))
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+class HistoryEvent:
+    """A change to a row of the capture history, passed to subscribers."""
+
+    INSERTED = "inserted"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+    def __init__(self, kind, screenshot_id):
+        self.kind = kind
+        self.screenshot_id = screenshot_id
+
+    def __repr__(self):
+        return f"<HistoryEvent({self.kind}, screenshot_id={self.screenshot_id})>"
+
+
+def coalesce_history_events(events):
+    """Reduce a burst of events to at most one per row, in first-seen order.
+
+    An insert followed by a delete cancels out, and an insert followed by
+    updates is still an insert.
+    """
+    kinds = {}
+    for event in events:
+        previous = kinds.get(event.screenshot_id)
+        if previous == HistoryEvent.INSERTED and event.kind == HistoryEvent.DELETED:
+            del kinds[event.screenshot_id]
+        elif previous == HistoryEvent.INSERTED and event.kind == HistoryEvent.UPDATED:
+            continue
+        else:
+            kinds[event.screenshot_id] = event.kind
+    return [HistoryEvent(kind, screenshot_id) for screenshot_id, kind in kinds.items()]
+
+
+class PreparedCapture:
+    """A stored and hashed capture that has no row yet (see ScreenshotManager.prepare_capture)."""
+
+    def __init__(self, image, filename, image_hash, text, started):
+        self.image = image
+        self.filename = filename
+        self.image_hash = image_hash
+        self.text = text  # Reused from a near-duplicate, or None to OCR
+        self.started = started
+
 
 class ScreenshotManager:
-    def __init__(self, ocr_model):
-        self.session = Session()
+    def __init__(self, ocr_model, max_workers=2, max_pending=8, thumbnail_cache=None, blob_store=None,
+                 max_attempts=3, retry_delay=30.0, reuse_distance=-1):
         self.ocr_model = ocr_model
+        self.blob_store = blob_store or BlobStore()
+        self.thumbnail_cache = thumbnail_cache  # Optional ThumbnailCache filled at capture time
         self._subscribers = []  # List to hold callback functions
+        self.worker_pool = WorkerPool(max_workers=max_workers, max_pending=max_pending)
+        # Captures are committed as queued rows first and OCRed from this queue
+        self.jobs = OCRJobQueue(
+            ocr_model,
+            self.worker_pool,
+            max_in_flight=min(max_workers, max_pending),
+            max_attempts=max_attempts,
+            retry_delay=retry_delay,
+            on_change=self._on_rows_changed
+        )
+        self.watchers = []  # Running RegionWatchers
+        self.hash_index = HashIndex()  # Perceptual hashes of all captures, loaded on first use
+        # Captures within this dHash distance of an OCRed one reuse its text; negative disables
+        self.reuse_distance = reuse_distance
+
+    @property
+    def session(self):
+        """The calling thread's own session (see db.ScopedSession)."""
+        return ScopedSession()
 
     def subscribe(self, callback):
-        """Add a subscriber to be notified of new screenshots."""
+        """Add a subscriber, called with a list of HistoryEvents on every change."""
         if callback not in self._subscribers:
             self._subscribers.append(callback)
 
@@ -20,41 +115,276 @@ class ScreenshotManager:
         if callback in self._subscribers:
             self._subscribers.remove(callback)
 
-    def _notify_subscribers(self):
+    def _notify_subscribers(self, *events):
         """Notify all subscribers of changes."""
-        for callback in self._subscribers:
-            callback()
-
-    def capture_screenshot(self, bbox):
-        """Capture and save a screenshot of the specified area."""
-        screenshot = ImageGrab.grab(bbox=bbox)
-        filename = f"screenshot_{int(time.time())}.png"
-        screenshot.save(filename)
-        
-        text = self.ocr_model.extract_text(filename)
-        
-        new_ss = ScreenShot(
-            stored_at=filename,
-            text=text,
-            created_at=datetime.now()
-        )
-        self.session.add(new_ss)
+        events = list(events)
+        with timings.stage("notify"):
+            for callback in self._subscribers:
+                callback(events)
+
+    def _on_rows_changed(self, screenshot_ids):
+        self._notify_subscribers(*[HistoryEvent(HistoryEvent.UPDATED, row_id) for row_id in screenshot_ids])
+
+    def capture_screenshot_async(self, bbox, on_chunk=None, on_finished=None, image=None):
+        """Capture a screenshot and queue it for OCR in the background.
+
+        The row is committed (with status 'queued') before this returns the
+        detached ScreenShot; subscribers are notified again as its OCR job
+        progresses. With `on_chunk`, OCR output is streamed and each chunk is
+        passed to it on the Tk thread as it arrives. `on_finished(ids, error)`
+        is called on the Tk thread once the job is done. Pass `image` to use an
+        already grabbed crop of bbox instead of grabbing now. If an OCRed
+        capture is within `reuse_distance` of this one, its text is copied
+        instead of queueing OCR.
+        """
+        with timings.profiled("capture"):
+            return self.queue_capture(self.prepare_capture(bbox, image), on_chunk, on_finished)
+
+    def prepare_capture(self, bbox, image=None):
+        """Grab, store and hash a capture and look for reusable text, without adding a row.
+
+        Doesn't touch the OCR queue, so it can run on any thread; pass the
+        returned PreparedCapture to `queue_capture` on the Tk thread.
+        """
+        started = time.perf_counter()
+        screenshot, filename, image_hash = self._grab_and_save(bbox, image)
+        text = self._find_reusable(image_hash)
+        return PreparedCapture(screenshot, filename, image_hash, text, started)
+
+    def queue_capture(self, capture, on_chunk=None, on_finished=None):
+        """Commit the row for a PreparedCapture and queue it for OCR (see `capture_screenshot_async`)."""
+        row = self._insert_rows([(capture.filename, capture.image_hash)], capture.text)[0]
+        self._notify_subscribers(HistoryEvent(HistoryEvent.INSERTED, row.id))
+        if capture.text is not None:
+            # Nothing to OCR, but the callbacks still run on the Tk thread
+            if on_chunk is not None:
+                self.worker_pool.post(on_chunk, capture.text)
+            if on_finished is not None:
+                self.worker_pool.post(on_finished, [row.id], None)
+            timings.record("capture_total", time.perf_counter() - capture.started)
+            return row
+        # OCR works on the in-memory grab, the saved file is only read after a restart
+        self.jobs.enqueue([row.id], [capture.image], on_chunk=on_chunk, on_finished=on_finished,
+                          started=capture.started)
+        return row
+
+    def capture_regions_async(self, regions, on_finished=None):
+        """Capture several regions and OCR them together with one batched request.
+
+        `regions` is a list of (bbox, image) pairs, image being None to grab
+        bbox now. One row per region is stored, all in the same transaction,
+        and the rows are returned.
+        """
+        started = time.perf_counter()
+        grabbed = [self._grab_and_save(bbox, image) for bbox, image in regions]
+        rows = self._insert_rows([(filename, image_hash) for screenshot, filename, image_hash in grabbed])
+        self._notify_subscribers(*[HistoryEvent(HistoryEvent.INSERTED, row.id) for row in rows])
+        self.jobs.enqueue([row.id for row in rows], [screenshot for screenshot, filename, image_hash in grabbed],
+                          on_finished=on_finished, started=started)
+        return rows
+
+    def _insert_rows(self, captures, text=None):
+        """Commit one row per (filename, dhash) right away and return them (detached).
+
+        Rows are queued for OCR, or already done when `text` is given.
+        """
+        created_at = datetime.now()
+        session = Session(expire_on_commit=False)
+        try:
+            if text is None:
+                rows = [ScreenShot(stored_at=filename, created_at=created_at, status=ScreenShot.QUEUED,
+                                   dhash=to_db(image_hash))
+                        for filename, image_hash in captures]
+            else:
+                rows = [ScreenShot(stored_at=filename, created_at=created_at, text=text, status=ScreenShot.DONE,
+                                   updated_at=created_at, dhash=to_db(image_hash))
+                        for filename, image_hash in captures]
+            session.add_all(rows)
+            with timings.stage("commit"):
+                session.commit()
+        finally:
+            session.close()
+        for row, (filename, image_hash) in zip(rows, captures):
+            self.hash_index.add(row.id, image_hash)
+        return rows
+
+    def _grab_and_save(self, bbox, image=None):
+        """Grab the screen area (unless already given), store it in the blob store and hash it."""
+        if image is not None:
+            screenshot = image
+        else:
+            with timings.stage("grab"):
+                screenshot = ImageGrab.grab(bbox=bbox)
+        with timings.stage("save"):
+            filename = self.blob_store.put(screenshot)
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.generate_async(filename, screenshot)
+        with timings.stage("hash"):
+            image_hash = dhash(screenshot)
+        return screenshot, filename, image_hash
+
+    def _find_reusable(self, image_hash):
+        """Text of the closest OCRed capture within reuse_distance, or None."""
+        if self.reuse_distance < 0:
+            return None
+        with timings.stage("hash"):
+            candidates = [screenshot_id for screenshot_id, distance
+                          in self.hash_index.nearest(image_hash, self.reuse_distance)]
+            if not candidates:
+                return None
+            session = Session()
+            try:
+                texts = dict(session.query(ScreenShot.id, ScreenShot.text)
+                             .filter(ScreenShot.id.in_(candidates),
+                                     ScreenShot.status == ScreenShot.DONE,
+                                     ScreenShot.text.isnot(None))
+                             .all())
+            finally:
+                session.close()
+        return next((texts[screenshot_id] for screenshot_id in candidates if screenshot_id in texts), None)
+
+    def find_similar(self, screenshot_id, max_distance=8, limit=20):
+        """Captures that look like `screenshot_id`, as (preview row, distance) pairs, closest first."""
+        image_hash = self._stored_hash(screenshot_id)
+        if image_hash is None:
+            return []
+        with timings.stage("hash"):
+            matches = self.hash_index.nearest(image_hash, max_distance, limit, exclude=screenshot_id)
+        rows = {row.id: row for row in self.get_history_rows([match_id for match_id, distance in matches])}
+        return [(rows[match_id], distance) for match_id, distance in matches if match_id in rows]
+
+    def _stored_hash(self, screenshot_id):
+        """The row's dHash, computed from its file (and stored) if the row predates hashing."""
+        row = (self.session.query(ScreenShot.dhash, ScreenShot.stored_at)
+               .filter(ScreenShot.id == screenshot_id)
+               .first())
+        if row is None:
+            return None
+        if row.dhash is not None:
+            return from_db(row.dhash)
+        if not row.stored_at or not os.path.exists(row.stored_at):
+            return None
+        with Image.open(row.stored_at) as image:
+            image_hash = dhash(image)
+        (self.session.query(ScreenShot)
+         .filter(ScreenShot.id == screenshot_id)
+         .update({ScreenShot.dhash: to_db(image_hash)}, synchronize_session=False))
         self.session.commit()
-        
-        # Notify subscribers of the new screenshot
-        self._notify_subscribers()
-        
-        return filename
-
-    def get_screenshots(self, page, per_page):
-        """Get a paginated list of screenshots."""
-        offset_val = page * per_page
-        return (self.session.query(ScreenShot)
-               .order_by(ScreenShot.id.desc())  # Show newest first
-               .limit(per_page)
-               .offset(offset_val)
-               .all())
+        self.hash_index.add(screenshot_id, image_hash)
+        return image_hash
+
+    def resume_jobs(self):
+        """Queue OCR for rows a previous run left unfinished; returns how many."""
+        return self.jobs.resume()
+
+    def retry_failed(self):
+        """Queue every failed row for another OCR pass; returns how many."""
+        return len(self.requeue_screenshots(status=ScreenShot.FAILED))
+
+    def requeue_screenshots(self, status=None, older_than=None, screenshot_ids=None):
+        """Re-OCR finished rows by status, age and/or id (see ocr_jobs.requeue_screenshots)."""
+        ids = self.jobs.requeue(status=status, older_than=older_than, screenshot_ids=screenshot_ids)
+        self._on_rows_changed(ids)
+        return ids
+
+    def watch_region(self, bbox, interval=0.5, change_threshold=0.02, on_error=None):
+        """Start capturing bbox whenever its content changes; returns the RegionWatcher.
+
+        `on_error(watcher, error)` is called on the Tk thread if the watcher gives up.
+        """
+        watcher = RegionWatcher(self, bbox, interval=interval, change_threshold=change_threshold,
+                                on_error=on_error)
+        watcher.start()
+        self.watchers.append(watcher)
+        return watcher
+
+    def stop_watching(self, watcher=None):
+        """Stop one watcher, or all of them."""
+        for running in list(self.watchers):
+            if watcher is None or running is watcher:
+                running.stop()
+                self.watchers.remove(running)
+
+    def poll_jobs(self):
+        """Hand finished OCR jobs back to the calling (Tk) thread."""
+        self.worker_pool.poll()
+
+    def shutdown(self):
+        """Stop background work without waiting for in-flight OCR.
+
+        Unfinished captures stay queued in the database and resume on the next start.
+        """
+        self.stop_watching()
+        self.jobs.stop()
+        self.worker_pool.shutdown(wait=False)
+        ScopedSession.remove()
+        if self.thumbnail_cache is not None:
+            self.thumbnail_cache.shutdown()
 
     def get_total_screenshots(self):
-        """Get total number of screenshots."""
-        return self.session.query(ScreenShot).count()
\ No newline at end of file
+        """Get total number of screenshots from the trigger-maintained counter."""
+        return (self.session.query(TableStats.row_count)
+               .filter(TableStats.table_name == ScreenShot.__tablename__)
+               .scalar()) or 0
+
+    def search_screenshots(self, query, limit=50):
+        """Full-text search over extracted text, best matches first."""
+        match = build_fts_query(query)
+        if match is None:
+            return []
+        rows = self.session.execute(
+            sql_text("SELECT rowid FROM screenshots_fts WHERE screenshots_fts MATCH :match "
+                     "ORDER BY bm25(screenshots_fts) LIMIT :limit"),
+            {"match": match, "limit": limit}
+        ).all()
+        ids = [row[0] for row in rows]
+        if not ids:
+            return []
+        by_id = {row.id: row for row in self._preview_query().filter(ScreenShot.id.in_(ids))}
+        return [by_id[i] for i in ids if i in by_id]
+
+    def _preview_query(self):
+        """Query history rows with a truncated text preview instead of the full text.
+
+        Only plain columns are selected, so no ORM objects (and no full OCR
+        text) end up in the session's identity map.
+        """
+        return self.session.query(
+            ScreenShot.id,
+            ScreenShot.created_at,
+            ScreenShot.stored_at,
+            ScreenShot.status,
+            ScreenShot.last_error,
+            func.substr(ScreenShot.text, 1, PREVIEW_CHARS).label("preview")
+        )
+
+    def get_history_rows(self, screenshot_ids):
+        """Preview rows for the given ids, newest first (missing ids are skipped)."""
+        if not screenshot_ids:
+            return []
+        return (self._preview_query()
+                .filter(ScreenShot.id.in_(list(screenshot_ids)))
+                .order_by(ScreenShot.id.desc())
+                .all())
+
+    def get_history_window(self, before_id=None, after_id=None, limit=50):
+        """Get up to `limit` preview rows, newest first.
+
+        With `before_id`, returns the rows just older than that id; with
+        `after_id`, the rows just newer than it (still newest first).
+        """
+        query = self._preview_query()
+        if after_id is not None:
+            rows = (query.filter(ScreenShot.id > after_id)
+                    .order_by(ScreenShot.id.asc())
+                    .limit(limit)
+                    .all())
+            return rows[::-1]
+        if before_id is not None:
+            query = query.filter(ScreenShot.id < before_id)
+        return query.order_by(ScreenShot.id.desc()).limit(limit).all()
+
+    def get_screenshot(self, screenshot_id):
+        """Get a single screenshot with its full text."""
+        # Bypass the identity map so rows updated by other threads are current
+        return self.session.get(ScreenShot, screenshot_id, populate_existing=True)
\ No newline at end of file
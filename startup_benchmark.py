@@ -0,0 +1,76 @@
+# startup_benchmark.py
+"""Measure how long the app takes to start, e.g. `python startup_benchmark.py --runs 5`.
+
+Reports the import time of the modules on the startup path (each in a fresh
+interpreter) and, unless --imports-only is given, launches main.py to time
+the first frame and the point where captures work. The latter needs a display.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Modules imported before the window appears, then the ones deferred to the background
+STARTUP_MODULES = ["config", "ui.main_window", "ui.screenshot_overlay"]
+DEFERRED_MODULES = ["db", "screenshot_manager", "ocr", "google.generativeai", "pynput"]
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def time_import(module):
+    """Seconds to import module in a fresh interpreter, or None if it isn't installed."""
+    code = ("import time; started = time.perf_counter(); import {}; "
+            "print(time.perf_counter() - started)").format(module)
+    result = subprocess.run([sys.executable, "-c", code], cwd=HERE, capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def time_launch(timeout=30):
+    """Launch main.py and return its {milestone: seconds} startup report."""
+    env = dict(os.environ, STARTUP_BENCHMARK_T0=repr(time.time()), STARTUP_BENCHMARK_EXIT="1")
+    result = subprocess.run([sys.executable, "main.py"], cwd=HERE, env=env,
+                            capture_output=True, text=True, timeout=timeout)
+    milestones = {}
+    for line in result.stdout.splitlines():
+        if line.startswith("STARTUP "):
+            _, event, seconds = line.split()
+            milestones[event] = float(seconds)
+    if not milestones:
+        raise RuntimeError(f"main.py reported no startup milestones:\n{result.stderr.strip()}")
+    return milestones
+
+
+def summarize(samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        return "not available"
+    return f"median {statistics.median(samples) * 1000:7.1f} ms, min {min(samples) * 1000:7.1f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark application startup time.")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement (default: 5)")
+    parser.add_argument("--imports-only", action="store_true", help="Skip launching the GUI")
+    args = parser.parse_args(argv)
+
+    print("Import time (fresh interpreter):")
+    for label, modules in (("startup", STARTUP_MODULES), ("deferred", DEFERRED_MODULES)):
+        for module in modules:
+            samples = [time_import(module) for _ in range(args.runs)]
+            print(f"  [{label}] {module:22} {summarize(samples)}")
+
+    if args.imports_only:
+        return 0
+    print("Launch (main.py):")
+    launches = [time_launch() for _ in range(args.runs)]
+    for event in ("first_frame", "ready"):
+        print(f"  {event:12} {summarize([launch.get(event) for launch in launches])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
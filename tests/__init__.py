@@ -0,0 +1,9 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+# Tests never touch the working copy's database; set before anything imports db
+_DB_DIR = tempfile.mkdtemp(prefix="math-ocr-tests-")
+atexit.register(shutil.rmtree, _DB_DIR, ignore_errors=True)
+os.environ.setdefault("MATH_OCR_DB_URL", f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}")
@@ -0,0 +1,125 @@
+import http.client
+import io
+import json
+import tempfile
+import time
+import unittest
+from unittest import mock
+from PIL import Image
+from api_server import MAX_BODY_BYTES, ApiServer
+from blob_store import BlobStore
+from db import init_db
+from ocr import OCR
+from ocr_backends import FakeBackend
+from screenshot_manager import ScreenshotManager
+
+TOKEN = "secret"
+
+
+def png_bytes(seed):
+    image = Image.new("RGB", (64, 32), "white")
+    for x in range(seed % 50 + 4):
+        image.putpixel((x, seed % 32), (0, 0, 0))
+    data = io.BytesIO()
+    image.save(data, format="PNG")
+    return data.getvalue()
+
+
+class ApiServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.blob_dir = tempfile.TemporaryDirectory()
+        cls.manager = ScreenshotManager(OCR(backend=FakeBackend(latency=0.01)),
+                                        blob_store=BlobStore(root=cls.blob_dir.name))
+        cls.server = ApiServer(cls.manager, port=0, token=TOKEN, poll_manager=True)
+        cls.server.start_in_thread()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.manager.shutdown()
+        cls.blob_dir.cleanup()
+
+    def request(self, method, path, body=None, token=TOKEN):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=10)
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        connection.request(method, path, body=body, headers=headers)
+        return connection.getresponse()
+
+    def get_json(self, path):
+        response = self.request("GET", path)
+        return response.status, json.loads(response.read())
+
+    def submit(self, seed):
+        response = self.request("POST", "/ocr", png_bytes(seed))
+        self.assertEqual(response.status, 202)
+        return json.loads(response.read())["id"]
+
+    def wait_done(self, screenshot_id, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            status, job = self.get_json(f"/jobs/{screenshot_id}")
+            self.assertEqual(status, 200)
+            if job["status"] == "done":
+                return job
+            time.sleep(0.02)
+        self.fail(f"Capture {screenshot_id} was not OCRed in time")
+
+    def test_stream_events(self):
+        response = self.request("POST", "/ocr?stream=1", png_bytes(1))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Type"), "application/x-ndjson")
+        events = [json.loads(line) for line in response.read().splitlines()]
+        self.assertEqual(events[0]["event"], "queued")
+        self.assertEqual(events[-1]["event"], "done")
+        self.assertEqual(events[-1]["id"], events[0]["id"])
+        self.assertEqual(events[-1]["status"], "done")
+        chunks = "".join(event["text"] for event in events if event["event"] == "chunk")
+        self.assertEqual(chunks, events[-1]["text"])
+
+    def test_job_status(self):
+        job = self.wait_done(self.submit(2))
+        self.assertTrue(job["text"])
+        status, payload = self.get_json("/jobs/999999")
+        self.assertEqual(status, 404)
+
+    def test_history_paging(self):
+        ids = [self.submit(seed) for seed in (3, 4, 5)]
+        status, page = self.get_json("/history?limit=2")
+        self.assertEqual(status, 200)
+        self.assertEqual([item["id"] for item in page["items"]], ids[:0:-1])
+        self.assertEqual(page["next_before_id"], ids[1])
+        status, page = self.get_json(f"/history?limit=2&before_id={ids[1]}")
+        self.assertEqual(page["items"][0]["id"], ids[0])
+        self.assertGreaterEqual(page["total"], 3)
+
+    def test_bad_requests(self):
+        response = self.request("POST", "/ocr", b"not an image")
+        self.assertEqual(response.status, 400)
+        self.assertIn("error", json.loads(response.read()))
+        self.assertEqual(self.get_json("/history?limit=zero")[0], 400)
+        self.assertEqual(self.get_json("/history?limit=0")[0], 400)
+
+    def test_missing_token(self):
+        self.assertEqual(self.request("GET", "/status", token=None).status, 401)
+        self.assertEqual(self.request("GET", "/status", token="wrong").status, 401)
+
+    def test_unexpected_error(self):
+        failure = mock.patch.object(self.manager, "search_screenshots", side_effect=RuntimeError("database is locked"))
+        with failure, mock.patch("traceback.print_exc"):
+            status, payload = self.get_json("/search?q=x")
+        self.assertEqual(status, 500)
+        self.assertIn("database is locked", payload["error"])
+
+    def test_body_too_large(self):
+        connection = http.client.HTTPConnection("127.0.0.1", self.server.port, timeout=10)
+        connection.putrequest("POST", "/ocr")
+        connection.putheader("Authorization", f"Bearer {TOKEN}")
+        connection.putheader("Content-Length", str(MAX_BODY_BYTES + 1))
+        connection.endheaders()
+        self.assertEqual(connection.getresponse().status, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import io
+import unittest
+from datetime import datetime
+from types import SimpleNamespace
+from history_export import LatexWriter, latex_escape
+
+
+def render(text):
+    out = io.StringIO()
+    writer = LatexWriter(out)
+    writer.write(SimpleNamespace(id=1, created_at=datetime(2026, 1, 1), stored_at=None, status="done", text=text))
+    return out.getvalue()
+
+
+class LatexWriterTest(unittest.TestCase):
+    def test_escaped_dollar_stays_literal(self):
+        self.assertEqual(latex_escape("\\$3 & 50%"), "\\$3 \\& 50\\%")
+
+    def test_prices_are_not_math(self):
+        self.assertIn("Costs \\$5 and \\$10", render("Costs $5 and $10"))
+
+    def test_unicode_symbols_are_mapped(self):
+        output = render("Let $α ≤ x$, so θ")
+        self.assertIn("$\\alpha  \\leq  x$", output)
+        self.assertIn("\\ensuremath{\\theta}", output)
+
+    def test_display_math_drops_blank_lines(self):
+        self.assertIn("\\[\n\\sum_i x_i\n= 1\n\\]", render("$$\n\\sum_i x_i\n\n= 1\n$$"))
+
+    def test_preamble_supports_unicode_engines(self):
+        out = io.StringIO()
+        LatexWriter(out).begin()
+        self.assertIn("\\usepackage{fontspec}", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from math_render import split_math
+
+
+class SplitMathTest(unittest.TestCase):
+    def test_inline_and_display(self):
+        self.assertEqual(split_math("$$\\frac{a}{b}$$ and $x^2$."), [
+            ("display", "\\frac{a}{b}"),
+            ("text", " and "),
+            ("inline", "x^2"),
+            ("text", "."),
+        ])
+
+    def test_prices_stay_text(self):
+        text = "Costs $5 and $10 today"
+        self.assertEqual(split_math(text), [("text", text)])
+
+    def test_inline_stops_at_blank_line(self):
+        text = "a $x\n\ny$ b"
+        self.assertEqual(split_math(text), [("text", text)])
+        self.assertEqual(split_math("$a\nb$"), [("inline", "a\nb")])
+
+    def test_escaped_dollars(self):
+        self.assertEqual(split_math("\\$3 and $a\\$$"), [("text", "\\$3 and "), ("inline", "a\\$")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import contextlib
+import io
+import tempfile
+import time
+import unittest
+from PIL import Image
+from blob_store import BlobStore
+from db import init_db
+from ocr import OCR
+from ocr_backends import FakeBackend
+from ocr_cache import OCRCache
+from screenshot_manager import ScreenshotManager
+
+
+class RequeueTest(unittest.TestCase):
+    def setUp(self):
+        init_db()
+        blob_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_dir.cleanup)
+        self.backend = FakeBackend(latency=0.0)
+        self.manager = ScreenshotManager(OCR(backend=self.backend, cache=OCRCache()),
+                                         blob_store=BlobStore(root=blob_dir.name))
+        self.addCleanup(self.manager.shutdown)
+
+    def drain(self, timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while not self.manager.jobs.idle:
+            self.assertLess(time.monotonic(), deadline, "OCR queue did not drain")
+            self.manager.poll_jobs()
+            time.sleep(0.01)
+
+    def test_requeued_row_calls_backend_again(self):
+        image = Image.new("RGB", (40, 20), "white")
+        image.putpixel((5, 5), (0, 0, 0))
+        row = self.manager.capture_screenshot_async(None, image=image)
+        self.drain()
+        self.assertEqual(self.backend.calls, 1)
+
+        self.assertEqual(self.manager.requeue_screenshots(screenshot_ids=[row.id]), [row.id])
+        self.drain()
+        self.assertEqual(self.backend.calls, 2)
+        self.assertEqual(self.manager.get_screenshot(row.id).status, "done")
+
+    def test_failing_callback_keeps_dispatching(self):
+        self.manager.jobs.max_in_flight = 1
+
+        def fail(ids, error):
+            raise RuntimeError("callback failed")
+
+        images = [Image.new("RGB", (40, 20), color) for color in ("red", "green", "blue")]
+        with contextlib.redirect_stderr(io.StringIO()):
+            rows = [self.manager.capture_screenshot_async(None, on_finished=fail, image=image) for image in images]
+            self.drain()
+        self.assertEqual([self.manager.get_screenshot(row.id).status for row in rows], ["done"] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from PIL import Image
+from region_watcher import RegionWatcher
+from worker_pool import WorkerPool
+
+
+class RegionWatcherErrorTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = SimpleNamespace(worker_pool=WorkerPool(max_workers=1), capture_screenshot_async=mock.Mock())
+        self.addCleanup(self.manager.worker_pool.shutdown)
+        self.reported = []
+
+    def watch(self, grab, **options):
+        watcher = RegionWatcher(self.manager, (0, 0, 10, 10), interval=0.001,
+                                on_error=lambda *args: self.reported.append(args), **options)
+        patcher = mock.patch("region_watcher.ImageGrab.grab", side_effect=grab)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(watcher.stop, 1.0)
+        watcher.start()
+        return watcher
+
+    def test_gives_up_after_repeated_failures(self):
+        watcher = self.watch(OSError("grab denied"), max_errors=3)
+        watcher._thread.join(5.0)
+        self.assertFalse(watcher.running)
+        self.assertEqual(watcher.errors, 3)
+        self.manager.worker_pool.poll()
+        self.assertEqual(len(self.reported), 1)
+        self.assertIs(self.reported[0][0], watcher)
+        self.assertIsInstance(self.reported[0][1], OSError)
+
+    def test_keeps_running_after_a_failure(self):
+        polled = threading.Event()
+        frame = Image.new("RGB", (10, 10))
+
+        def grab(bbox):
+            if not polled.is_set():
+                polled.set()
+                raise OSError("grab denied")
+            return frame
+
+        watcher = self.watch(grab, max_errors=2)
+        for _ in range(500):
+            if watcher.polls >= 3:
+                break
+            threading.Event().wait(0.01)
+        self.assertTrue(watcher.running)
+        self.assertEqual(watcher.errors, 1)
+        self.manager.worker_pool.poll()
+        self.assertEqual(self.reported, [])
+
+    def test_reports_failed_capture(self):
+        self.manager.capture_screenshot_async.side_effect = OSError("disk full")
+        watcher = self.watch(lambda bbox: Image.new("RGB", (10, 10)))
+        for _ in range(500):
+            self.manager.worker_pool.poll()
+            if self.reported:
+                break
+            threading.Event().wait(0.01)
+        watcher._thread.join(5.0)
+        self.assertFalse(watcher.running)
+        self.assertEqual(watcher.captures, 0)
+        self.assertEqual(len(self.reported), 1)
+        self.assertIsInstance(self.reported[0][1], OSError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import unittest
+from PIL import Image
+from ui.screenshot_overlay import ScreenshotOverlay
+
+
+class GrabPixelsTest(unittest.TestCase):
+    def test_scaled_display(self):
+        overlay = ScreenshotOverlay(None, None, freeze_frame=True)
+        overlay.frozen = Image.new("RGB", (2880, 1800))
+        self.assertEqual(overlay._to_grab_pixels((10, 20, 110, 70), (1440, 900)), (20, 40, 220, 140))
+
+    def test_unscaled_display(self):
+        overlay = ScreenshotOverlay(None, None, freeze_frame=True)
+        overlay.frozen = Image.new("RGB", (1440, 900))
+        self.assertEqual(overlay._to_grab_pixels((10, 20, 110, 70), (1440, 900)), (10, 20, 110, 70))
+
+
+if __name__ == "__main__":
+    unittest.main()
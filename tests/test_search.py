@@ -0,0 +1,57 @@
+import unittest
+from db import Session, ScreenShot, init_db
+from ocr import OCR
+from ocr_backends import FakeBackend
+from screenshot_manager import ScreenshotManager, build_fts_query
+
+
+class LatexSearchTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        init_db()
+        cls.manager = ScreenshotManager(OCR(backend=FakeBackend(latency=0.0)))
+        texts = ["Area $2\\pi r$ zqfirst", "Let $x\\in A$ zqsecond", "$\\alpha\\beta$ zqthird", "$e^{i\\pi}$ zqfourth"]
+        session = Session()
+        try:
+            rows = [ScreenShot(text=text) for text in texts]
+            session.add_all(rows)
+            session.commit()
+            cls.ids = [row.id for row in rows]
+        finally:
+            session.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.manager.shutdown()
+
+    def search(self, query):
+        return {row.id for row in self.manager.search_screenshots(query)} & set(self.ids)
+
+    def test_commands_after_other_characters(self):
+        first, second, third, fourth = self.ids
+        self.assertEqual(self.search("\\pi"), {first, fourth})
+        self.assertEqual(self.search("\\in"), {second})
+        self.assertEqual(self.search("\\beta"), {third})
+        self.assertEqual(self.search("\\alpha\\beta"), {third})
+        self.assertEqual(self.search("2\\pi"), {first})
+
+    def test_updated_text_is_reindexed(self):
+        session = Session()
+        try:
+            row = ScreenShot(text="zqupdate \\gamma")
+            session.add(row)
+            session.commit()
+            row.text = "zqupdate \\delta"
+            session.commit()
+            row_id = row.id
+        finally:
+            session.close()
+        self.assertEqual({row.id for row in self.manager.search_screenshots("\\gamma zqupdate")}, set())
+        self.assertEqual([row.id for row in self.manager.search_screenshots("zqupdate \\delta")], [row_id])
+
+    def test_query_terms(self):
+        self.assertEqual(build_fts_query("2\\pi"), '"2" "\\pi"*')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from tiling import TilingOptions, find_cuts, stitch_texts
+
+
+class StitchTextsTest(unittest.TestCase):
+    def test_drops_repeated_lines(self):
+        self.assertEqual(stitch_texts(["a\nb\nc line", "c  line\nd\ne", "e\nf"]), "a\nb\nc line\nd\ne\nf")
+
+    def test_overlap_with_blank_lines(self):
+        self.assertEqual(stitch_texts(["a\n\nb\n\nc", "b\n\nc\n\nd"]), "a\n\nb\n\nc\n\nd")
+
+    def test_overlap_around_display_math(self):
+        first = "Intro\n\n$$x^2$$\n\nwhere"
+        second = "$$x^2$$\n\nwhere\n\nx is real"
+        self.assertEqual(stitch_texts([first, second]), "Intro\n\n$$x^2$$\n\nwhere\n\nx is real")
+
+    def test_no_overlap(self):
+        self.assertEqual(stitch_texts(["x", "y"]), "x\ny")
+
+
+class FindCutsTest(unittest.TestCase):
+    def test_cuts_in_blank_rows(self):
+        profile = np.ones(250, dtype=int)
+        profile[80:90] = 0
+        profile[170:180] = 0
+        self.assertEqual(find_cuts(profile, 100), [85, 175])
+
+    def test_small_band_height_terminates(self):
+        profile = np.ones(10, dtype=int)
+        self.assertEqual(find_cuts(profile, 2), list(range(1, 9)))
+
+    def test_rejects_degenerate_band_height(self):
+        for band_height in (0, 1):
+            with self.assertRaises(ValueError):
+                find_cuts(np.ones(10, dtype=int), band_height)
+            with self.assertRaises(ValueError):
+                TilingOptions(band_height=band_height)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+import contextlib
+import io
+import unittest
+from worker_pool import WorkerPool
+
+
+class WorkerPoolPollTest(unittest.TestCase):
+    def test_failing_callback_does_not_strand_the_queue(self):
+        pool = WorkerPool(max_workers=1)
+        self.addCleanup(pool.shutdown)
+        calls = []
+
+        def fail():
+            raise RuntimeError("boom")
+
+        pool.post(calls.append, 1)
+        pool.post(fail)
+        pool.post(calls.append, 2)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            pool.poll()
+        self.assertEqual(calls, [1, 2])
+        self.assertIn("RuntimeError: boom", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
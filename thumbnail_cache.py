@@ -0,0 +1,80 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageTk
+
+
+class ThumbnailCache:
+    """Persistent thumbnail files plus an in-memory LRU of Tk `PhotoImage`s.
+
+    Thumbnails are written to `cache_dir` in the background as captures are
+    taken, and regenerated on demand if one is missing. Cache keys include
+    the source file's size and mtime, so a rewritten file never shows a stale
+    thumbnail.
+    """
+
+    def __init__(self, cache_dir="thumbnails", size=(400, 400), max_photos=64):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.max_photos = max_photos
+        self._photos = OrderedDict()  # key -> PhotoImage, only touched on the Tk thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+
+    def cache_key(self, image_path):
+        stat = os.stat(image_path)
+        source = f"{os.path.abspath(image_path)}:{stat.st_size}:{stat.st_mtime_ns}:{self.size[0]}x{self.size[1]}"
+        return hashlib.sha1(source.encode()).hexdigest()
+
+    def thumbnail_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.png")
+
+    def _write_thumbnail(self, key, image):
+        thumb = image.copy()
+        thumb.thumbnail(self.size, Image.Resampling.LANCZOS)
+        path = self.thumbnail_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so readers never see a half-written PNG
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        thumb.save(tmp_path, format="PNG")
+        os.replace(tmp_path, path)
+        return path
+
+    def ensure_thumbnail(self, image_path, image=None):
+        """Return the cached thumbnail path, generating it if it's missing."""
+        key = self.cache_key(image_path)
+        path = self.thumbnail_path(key)
+        if os.path.exists(path):
+            return path
+        with self._lock:
+            if os.path.exists(path):
+                return path
+            if image is not None:
+                return self._write_thumbnail(key, image)
+            with Image.open(image_path) as source:
+                return self._write_thumbnail(key, source)
+
+    def generate_async(self, image_path, image=None):
+        """Create the thumbnail in the background, optionally from an in-memory image."""
+        return self._executor.submit(self.ensure_thumbnail, image_path, image)
+
+    def get_photo(self, image_path):
+        """Get a `PhotoImage` thumbnail for image_path. Must be called on the Tk thread."""
+        key = self.cache_key(image_path)
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+
+        path = self.ensure_thumbnail(image_path)
+        with Image.open(path) as thumb:
+            photo = ImageTk.PhotoImage(thumb)
+        self._photos[key] = photo
+        while len(self._photos) > self.max_photos:
+            self._photos.popitem(last=False)
+        return photo
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
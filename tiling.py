@@ -0,0 +1,158 @@
+# tiling.py
+"""Split tall captures into horizontal bands that can be OCRed in parallel.
+
+Run `python tiling.py page.png` to compare tiled and single-shot OCR
+latency on an image with the configured backend.
+"""
+import argparse
+import sys
+import time
+import numpy as np
+
+
+class TilingOptions:
+    """When and how to cut a capture into bands."""
+
+    def __init__(self, min_height=1600, band_height=1000, overlap=40, tolerance=32, max_workers=4):
+        if band_height < 2:
+            raise ValueError(f"Band height must be at least 2 pixels, got {band_height}")
+        self.min_height = min_height  # Images at least this tall are tiled, 0 disables tiling
+        self.band_height = band_height  # Target band height; cuts are moved up to whitespace
+        self.overlap = overlap  # Pixels each band extends past its cut
+        self.tolerance = tolerance  # Max brightness difference still treated as background
+        self.max_workers = max_workers  # Bands OCRed at the same time
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            min_height=config.tile_min_height,
+            band_height=config.tile_band_height,
+            overlap=config.tile_overlap,
+            max_workers=config.tile_workers
+        )
+
+    def should_tile(self, image):
+        return bool(self.min_height) and image.height >= self.min_height
+
+
+def row_profile(image, tolerance=32):
+    """Number of non-background pixels in each row.
+
+    The background is the most common gray level, which for screenshots
+    of documents is the page colour.
+    """
+    gray = np.asarray(image.convert("L"))
+    background = np.bincount(gray.ravel(), minlength=256).argmax()
+    ink = np.abs(gray.astype(np.int16) - background) > tolerance
+    return ink.sum(axis=1)
+
+
+def find_cuts(profile, band_height):
+    """Rows to cut at so that no band is much taller than band_height.
+
+    Each cut is placed in the middle of the lowest blank run found in the
+    lower half of the allowed range, falling back to the emptiest row.
+    """
+    if band_height < 2:
+        raise ValueError(f"Band height must be at least 2 pixels, got {band_height}")
+    height = len(profile)
+    cuts = []
+    start = 0
+    while height - start > band_height:
+        low, high = start + band_height // 2, start + band_height
+        window = profile[low:high]
+        blank = np.flatnonzero(window == 0)
+        if blank.size:
+            # Last run of consecutive blank rows in the window
+            run_starts = np.flatnonzero(np.diff(blank) != 1) + 1
+            run = blank[run_starts[-1]:] if run_starts.size else blank
+            cut = low + int(run[len(run) // 2])
+        else:
+            cut = low + len(window) - 1 - int(np.argmin(window[::-1]))
+        cut = max(cut, start + 1)  # Always make progress
+        cuts.append(cut)
+        start = cut
+    return cuts
+
+
+def split_bands(image, options):
+    """Crop image into overlapping horizontal bands, top to bottom."""
+    cuts = find_cuts(row_profile(image, options.tolerance), options.band_height)
+    edges = [0] + cuts + [image.height]
+    return [
+        image.crop((0, max(0, top - options.overlap), image.width, min(image.height, bottom + options.overlap)))
+        for top, bottom in zip(edges, edges[1:])
+    ]
+
+
+def _normalize(line):
+    return " ".join(line.split())
+
+
+def stitch_texts(texts, max_overlap_lines=6):
+    """Join band texts, dropping lines repeated at the start of a band.
+
+    Bands overlap a little, so a line cut through by a band edge may be
+    read by both neighbours.
+    """
+    lines = []
+    for text in texts:
+        band = text.strip("\n").splitlines()
+        # Blank lines are ignored on both sides, so paragraph breaks don't hide the overlap
+        previous = [_normalize(line) for line in lines if line.strip()][-max_overlap_lines:]
+        content = [index for index, line in enumerate(band) if line.strip()]
+        current = [_normalize(band[index]) for index in content]
+        for size in range(min(len(previous), len(current)), 0, -1):
+            if previous[-size:] == current[:size]:
+                band = band[content[size - 1] + 1:]
+                break
+        lines.extend(band)
+    return "\n".join(lines)
+
+
+def benchmark(ocr_model, image, runs=3):
+    """Median wall-clock seconds of tiled and single-shot OCR on image (cache bypassed)."""
+    options = ocr_model.tiling
+    results = {}
+    for label, tiled in (("single", False), ("tiled", True)):
+        samples = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            if tiled:
+                ocr_model.extract_tiled(image, options)
+            else:
+                ocr_model.extract_single(image)
+            samples.append(time.perf_counter() - started)
+        results[label] = sorted(samples)[len(samples) // 2]
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare tiled and single-shot OCR latency on an image.")
+    parser.add_argument("image", help="Image file to OCR")
+    parser.add_argument("--runs", type=int, default=3, help="Repetitions of each mode (default: 3)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Override OCR_RATE_LIMIT (requests per second, 0 for unlimited)")
+    args = parser.parse_args(argv)
+
+    from PIL import Image
+    from config import Config
+    from ocr import OCR
+
+    config = Config()
+    if args.rate is not None:
+        config.ocr_rate_limit = args.rate
+    ocr_model = OCR.from_config(config)
+    with Image.open(args.image) as f:
+        image = f.copy()
+    bands = split_bands(image, ocr_model.tiling)
+    print(f"{image.width}x{image.height} px, {len(bands)} band(s) of up to {ocr_model.tiling.band_height} px")
+    results = benchmark(ocr_model, image, runs=args.runs)
+    for label, seconds in results.items():
+        print(f"{label:7} {seconds:7.2f} s")
+    print(f"speedup {results['single'] / results['tiled']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,115 @@
 # ui/main_window.py (updated version)
 from datetime import datetime
+import threading
 import tkinter as tk
-from tkinter import ttk, messagebox
-import math
-from ocr import OCR
+from tkinter import ttk, messagebox, filedialog
+from instrumentation import timings
+from math_render import MathRenderer
 from ui.ocr_viewer import OCRViewer
+from ui.screenshot_overlay import ScreenshotOverlay
 
 class MainWindow:
-    def __init__(self, config, screenshot_manager):
+    JOB_POLL_MS = 100  # How often finished OCR jobs are collected on the Tk thread
+    SEARCH_LIMIT = 100  # Max rows shown for a full-text search
+    FETCH_SIZE = 50  # History rows fetched per scroll step
+    MAX_LOADED_ROWS = 300  # Rows kept in the Treeview before the far end is dropped
+    SCROLL_MARGIN = 0.1  # Fetch more rows when the view is this close to either end
+    UI_FRAME_MS = 16  # History change events are batched into one update per frame
+    DIAGNOSTICS_REFRESH_MS = 1000  # Update interval of the Diagnostics tab while it is shown
+
+    def __init__(self, config, screenshot_manager=None):
+        """Build the window. Without a screenshot manager it shows an empty,
+        loading history until `attach_screenshot_manager` is called."""
         self.config = config
-        self.screenshot_manager = screenshot_manager
-        self.current_page = 0
-        self.per_page = 10
+        self.screenshot_manager = None
+        # The Treeview holds a sliding window of rows; these say whether it
+        # currently reaches the newest / oldest end of the history
+        self.window_at_newest = True
+        self.window_at_oldest = False
+        self.history_fetch_scheduled = False
+        self.search_query = ""  # Non-empty while showing full-text search results
+        self.region_watcher = None  # Set while a region is being watched
+        self.queued_history_events = []  # HistoryEvents not yet applied to the Treeview
+        self.history_update_scheduled = False
+        # Renders the formulas in the viewer; matplotlib is only imported on the first render
+        self.math_renderer = MathRenderer(cache_dir=config.math_render_dir) if config.render_math else None
         
         self.root = tk.Tk()
         self.root.title("Screenshot Application")
         self.root.geometry("800x600")
         
+        self.setup_menu()
         self.setup_notebook()
         self.setup_screenshot_history()
         self.setup_api_key_tab()
+        self.setup_diagnostics_tab()
         
+        if screenshot_manager is not None:
+            self.attach_screenshot_manager(screenshot_manager)
+        else:
+            self.history_label.config(text="Loading…")
+
+    def attach_screenshot_manager(self, screenshot_manager, history_rows=None):
+        """Connect the capture pipeline once it is ready.
+
+        `history_rows` are the newest history rows if they were already
+        fetched off the Tk thread; otherwise they are loaded here.
+        """
+        self.screenshot_manager = screenshot_manager
+        # Re-render history whenever a capture is queued or finished
+        self.screenshot_manager.subscribe(self.on_history_changed)
+        self.root.after(self.JOB_POLL_MS, self.poll_ocr_jobs)
+        with timings.stage("refresh"):
+            self._refresh_table(history_rows)
+        
+    def setup_menu(self):
+        menubar = tk.Menu(self.root)
+        file_menu = tk.Menu(menubar, tearoff=0)
+        file_menu.add_command(label="Export History…", command=self.export_history)
+        menubar.add_cascade(label="File", menu=file_menu)
+        self.root.config(menu=menubar)
+
+    def export_history(self):
+        """Export the history (or the current search results) to JSONL, Markdown or LaTeX."""
+        if self.screenshot_manager is None:
+            return
+        path = filedialog.asksaveasfilename(
+            title="Export history" + (f" matching '{self.search_query}'" if self.search_query else ""),
+            defaultextension=".md",
+            initialfile=f"math_ocr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md",
+            filetypes=[("Markdown", "*.md"), ("JSON Lines", "*.jsonl"), ("LaTeX", "*.tex")]
+        )
+        if not path:
+            return
+        from history_export import export_history, format_for_path
+        export_format = format_for_path(path)
+        if export_format is None:
+            messagebox.showerror("Export", "Choose a .md, .jsonl or .tex file name.")
+            return
+        query = self.search_query or None
+        post = self.screenshot_manager.worker_pool.post
+        
+        def run():
+            # Large histories take a while; the result is reported back on the Tk thread
+            try:
+                count = export_history(path, export_format, query=query)
+            except Exception as e:
+                post(messagebox.showerror, "Export", f"Failed to export history: {e}")
+                return
+            post(messagebox.showinfo, "Export", f"Exported {count} capture(s) to {path}")
+        threading.Thread(target=run, name="export", daemon=True).start()
+
     def setup_notebook(self):
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(expand=True, fill="both")
         
         self.tab_a = ttk.Frame(self.notebook)
         self.tab_b = ttk.Frame(self.notebook)
+        self.tab_diagnostics = ttk.Frame(self.notebook)
         
         self.notebook.add(self.tab_a, text="Screenshot History")
         self.notebook.add(self.tab_b, text="Gemini API Key")
+        self.notebook.add(self.tab_diagnostics, text="Diagnostics")
 
     def setup_screenshot_history(self):
         columns = ("ID", "Created At", "Stored At", "Extracted Text")
@@ -48,21 +128,20 @@ class MainWindow:
         self.tree.column("Stored At", width=150, anchor="center")
         self.tree.column("Extracted Text", width=250, anchor="w")
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.tab_a, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscroll=scrollbar.set)
+        # Add scrollbar; scrolling near either end loads more rows on demand
+        self.history_scrollbar = ttk.Scrollbar(self.tab_a, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscroll=self.on_tree_scroll)
         
         # Pack widgets
         self.tree.pack(expand=True, fill="both", side="left")
-        scrollbar.pack(side="right", fill="y")
+        self.history_scrollbar.pack(side="right", fill="y")
         
         # Bind double-click event
         self.tree.bind("<Double-1>", self.on_item_double_click)
+        self.tree.tag_configure("pending", foreground="gray")
         
-        self.setup_pagination()
-        self.load_screenshot_history()
-        # Load initial data
-        self.refresh_table()
+        self.setup_search()
+        self.setup_history_controls()
 
     def setup_api_key_tab(self):
         """Setup the Gemini API key configuration tab."""
@@ -159,6 +238,7 @@ class MainWindow:
             
             try:
                 # Attempt to initialize OCR with current key
+                from ocr import OCR
                 ocr = OCR(api_key=self.config.gemini_api_key)
                 # Try a simple test (you'll need to implement this in your OCR class)
                 test_result = ocr.test_connection()
@@ -248,136 +328,494 @@ class MainWindow:
                 foreground="green"
             )
             
-            # Reinitialize OCR model with new key
-            self.screenshot_manager.ocr_model = OCR(api_key=key)
+            # Point the OCR backend at the new key, keeping cache and settings
+            if self.screenshot_manager is not None:
+                self.screenshot_manager.ocr_model.set_api_key(key)
             
         except Exception as e:
             messagebox.showerror(
                 "Error",
                 f"Failed to save API key: {str(e)}"
             )
+    def setup_diagnostics_tab(self):
+        """Setup the tab showing per-stage capture latencies and OCR client counters."""
+        main_frame = ttk.Frame(self.tab_diagnostics, padding="10")
+        main_frame.pack(fill="both", expand=True)
+        
+        columns = ("Stage", "Count", "Last (ms)", "p50 (ms)", "p95 (ms)", "p99 (ms)", "Max (ms)")
+        self.diagnostics_tree = ttk.Treeview(main_frame, columns=columns, show="headings", height=12)
+        for column in columns:
+            self.diagnostics_tree.heading(column, text=column)
+            self.diagnostics_tree.column(column, width=90, anchor="e" if column != "Stage" else "w")
+        self.diagnostics_tree.pack(fill="both", expand=True)
+        
+        self.diagnostics_label = ttk.Label(main_frame, text="", justify="left")
+        self.diagnostics_label.pack(anchor="w", pady=(10, 0))
+        
+        buttons_frame = ttk.Frame(main_frame)
+        buttons_frame.pack(fill="x", pady=(10, 0))
+        ttk.Button(buttons_frame, text="↻ Refresh", command=self.refresh_diagnostics).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Reset", command=self.reset_diagnostics).pack(side="left", padx=5)
+        ttk.Button(buttons_frame, text="Export JSON…", command=self.export_diagnostics).pack(side="left", padx=5)
+        
+        self.root.after(self.DIAGNOSTICS_REFRESH_MS, self.poll_diagnostics)
+
+    def poll_diagnostics(self):
+        """Keep the Diagnostics tab current while it is the selected tab."""
+        if self.notebook.select() == str(self.tab_diagnostics):
+            self.refresh_diagnostics()
+        self.root.after(self.DIAGNOSTICS_REFRESH_MS, self.poll_diagnostics)
+
+    def refresh_diagnostics(self):
+        """Fill the Diagnostics tab from the current timings and OCR counters."""
+        if self.screenshot_manager is None:
+            return
+        def fmt(value):
+            return "" if value is None else f"{value:.1f}"
+        
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for stage, summary in timings.snapshot().items():
+            self.diagnostics_tree.insert("", "end", values=(
+                stage, summary["count"], fmt(summary["last_ms"]), fmt(summary["p50_ms"]),
+                fmt(summary["p95_ms"]), fmt(summary["p99_ms"]), fmt(summary["max_ms"])
+            ))
+        
+        stats = self.screenshot_manager.ocr_model.stats()
+        calls = stats["calls"]
+        lines = [
+            f"Backend: {stats['backend']}, circuit {stats['circuit_state']}",
+            f"API calls: {calls['calls']} ({calls['retries']} retries, {calls['failures']} failed, "
+            f"{calls['rejected']} rejected, {stats['coalesced']} coalesced)",
+        ]
+        if "cache" in stats:
+            cache = stats["cache"]
+            lines.append(f"OCR cache: {cache['hit_rate']:.0%} hit rate ({cache['memory_hits']} memory, "
+                         f"{cache['db_hits']} database, {cache['misses']} misses)")
+        jobs = self.screenshot_manager.jobs.stats()
+        lines.append(f"OCR queue: {jobs['backlog']} waiting, {jobs['in_flight']} running, "
+                     f"{jobs['retrying']} waiting to retry")
+        self.diagnostics_label.config(text="\n".join(lines))
+
+    def reset_diagnostics(self):
+        timings.reset()
+        self.refresh_diagnostics()
+
+    def export_diagnostics(self):
+        """Save the timings and OCR counters to a JSON file."""
+        path = filedialog.asksaveasfilename(
+            title="Export diagnostics",
+            defaultextension=".json",
+            initialfile=f"diagnostics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            filetypes=[("JSON", "*.json")]
+        )
+        if not path or self.screenshot_manager is None:
+            return
+        try:
+            timings.export_json(path, extra={"ocr": self.screenshot_manager.ocr_model.stats()})
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to export diagnostics: {e}")
+
+    def capture_region(self, bbox, image=None):
+        """Queue a capture of the selected area for background OCR.
+
+        `image` is the already grabbed area in freeze-frame mode. When
+        streaming is enabled, a viewer opens right after the grab and
+        fills in the text as the OCR backend produces it.
+        """
+        if not self.config.stream_ocr:
+            self.screenshot_manager.capture_screenshot_async(bbox, image=image)
+            return
+        
+        # The viewer is created after the grab so it can't end up in the capture;
+        # chunks are only delivered from the Tk loop, after it exists
+        viewer = None
+        def on_chunk(chunk):
+            viewer.append_text(chunk)
+        def on_finished(screenshot_ids, error):
+            viewer.finish_streaming(screenshot_ids, error)
+        
+        row = self.screenshot_manager.capture_screenshot_async(bbox, on_chunk, on_finished, image)
+        viewer = self.new_viewer()
+        viewer.show_streaming(row.stored_at)
+
+    def capture_regions(self, regions):
+        """Queue several selected areas to be OCRed together in one request."""
+        self.screenshot_manager.capture_regions_async(regions)
+
+    def retry_failed(self):
+        """Queue every capture whose OCR failed for another attempt."""
+        if self.screenshot_manager is None:
+            return
+        count = self.screenshot_manager.retry_failed()
+        messagebox.showinfo("Retry Failed", f"Queued {count} failed capture(s) for OCR."
+                            if count else "No failed captures to retry.")
+
+    def poll_ocr_jobs(self):
+        """Collect finished OCR jobs and reschedule itself on the Tk loop."""
+        try:
+            self.screenshot_manager.poll_jobs()
+        finally:
+            self.root.after(self.JOB_POLL_MS, self.poll_ocr_jobs)
+
+    def history_row_values(self, row):
+        # Imported here so the window can open before SQLAlchemy is loaded
+        from screenshot_manager import PREVIEW_CHARS
+        created_at_str = row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else ""
+        if row.status == "failed":
+            preview = f"⚠ failed: {row.last_error}"
+        elif row.status != "done":
+            preview = f"⏳ {row.status}"
+        else:
+            preview = " ".join((row.preview or "").split())
+            if len(row.preview or "") >= PREVIEW_CHARS:
+                preview += "…"
+        return (row.id, created_at_str, row.stored_at, preview)
+
+    def history_row_tags(self, row):
+        # Captures without OCR text yet are grayed out
+        return ("pending",) if row.status != "done" else ()
+
+    def insert_history_row(self, row, index="end"):
+        """Insert a preview row (see ScreenshotManager.get_history_window)."""
+        return self.tree.insert("", index, iid=str(row.id), values=self.history_row_values(row),
+                                tags=self.history_row_tags(row))
+
     def on_item_double_click(self, event):
         """Handle double-click on screenshot history item."""
-        item = self.tree.selection()[0]
-        values = self.tree.item(item)['values']
-        if values:
-            image_path = values[2]  # Stored At column
-            ocr_text = values[3]    # Extracted Text column
-            
-            viewer = OCRViewer(self.root)
-            viewer.show(image_path, ocr_text)
+        selection = self.tree.selection()
+        if not selection:
+            return
+        item = selection[0]
+        # The table only holds a preview, fetch the full text now
+        screenshot = self.screenshot_manager.get_screenshot(int(item))
+        if screenshot is None:
+            return
+        ocr_text = screenshot.text or ""
+        if not ocr_text and screenshot.status != "done":
+            # No text yet, just show the status
+            ocr_text = self.tree.item(item)['values'][3]
+        
+        viewer = self.new_viewer()
+        viewer.show(screenshot.stored_at, ocr_text)
+
+    def new_viewer(self):
+        return OCRViewer(self.root, self.screenshot_manager.thumbnail_cache, self.math_renderer)
 
-    def setup_pagination(self):
-        """Setup pagination controls."""
-        pagination_frame = ttk.Frame(self.history_frame)
-        pagination_frame.pack(fill="x", padx=5, pady=5)
+    def setup_history_controls(self):
+        """Setup the refresh button and history status line."""
+        controls_frame = ttk.Frame(self.history_frame)
+        controls_frame.pack(fill="x", padx=5, pady=5)
         
         # Add refresh button
         self.refresh_btn = ttk.Button(
-            pagination_frame,
+            controls_frame,
             text="↻ Refresh",
             command=self.refresh_table,
             width=10
         )
         self.refresh_btn.pack(side="left", padx=5)
         
-        # Add pagination controls
-        self.prev_button = ttk.Button(
-            pagination_frame,
-            text="← Previous",
-            command=self.prev_page,
-            width=10
+        # Capture a region automatically whenever it changes
+        self.watch_btn = ttk.Button(
+            controls_frame,
+            text="👁 Watch Region",
+            command=self.toggle_watch_region,
+            width=16
         )
-        self.prev_button.pack(side="left", padx=5)
-        
-        self.page_label = ttk.Label(pagination_frame, text="Page 1")
-        self.page_label.pack(side="left", padx=10)
+        self.watch_btn.pack(side="left", padx=5)
         
-        self.next_button = ttk.Button(
-            pagination_frame,
-            text="Next →",
-            command=self.next_page,
-            width=10
+        self.retry_btn = ttk.Button(
+            controls_frame,
+            text="⟳ Retry Failed",
+            command=self.retry_failed,
+            width=14
         )
-        self.next_button.pack(side="left", padx=5)
-        
-        # Add page size selector
-        ttk.Label(pagination_frame, text="Items per page:").pack(side="left", padx=5)
-        self.page_size_var = tk.StringVar(value=str(self.per_page))
-        page_size_combo = ttk.Combobox(
-            pagination_frame,
-            textvariable=self.page_size_var,
-            values=["5", "10", "20", "50"],
-            width=5,
-            state="readonly"
+        self.retry_btn.pack(side="left", padx=5)
+        
+        # List captures that look like the selected one
+        self.similar_btn = ttk.Button(
+            controls_frame,
+            text="≈ Find Similar",
+            command=self.find_similar,
+            width=14
         )
-        page_size_combo.pack(side="left", padx=5)
-        page_size_combo.bind("<<ComboboxSelected>>", self.on_page_size_change)
+        self.similar_btn.pack(side="left", padx=5)
+        
+        self.history_label = ttk.Label(controls_frame, text="")
+        self.history_label.pack(side="left", padx=10)
 
-    def load_screenshot_history(self):
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        # Load new items
-        screenshots = self.screenshot_manager.get_screenshots(self.current_page, self.per_page)
-        
-        for ss in screenshots:
-            created_at_str = ss.created_at.strftime("%Y-%m-%d %H:%M:%S") if ss.created_at else ""
-            self.tree.insert("", "end", values=(ss.id, created_at_str, ss.stored_at, ss.text))
-        
-        # Update pagination
-        total_records = self.screenshot_manager.get_total_screenshots()
-        total_pages = math.ceil(total_records / self.per_page)
-        self.page_label.config(text=f"Page {self.current_page + 1} of {total_pages}")
-        
-        self.prev_button.config(state="disabled" if self.current_page <= 0 else "normal")
-        self.next_button.config(state="disabled" if self.current_page >= total_pages - 1 else "normal")
-
-    def prev_page(self):
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.load_screenshot_history()
-
-    def next_page(self):
-        total_records = self.screenshot_manager.get_total_screenshots()
-        total_pages = math.ceil(total_records / self.per_page)
-        if self.current_page < total_pages - 1:
-            self.current_page += 1
-            self.load_screenshot_history()
+    def find_similar(self):
+        """Show the captures that are near-duplicates of the selected one."""
+        selection = self.tree.selection()
+        if self.screenshot_manager is None or not selection:
+            messagebox.showinfo("Find Similar", "Select a capture first.")
+            return
+        screenshot_id = int(selection[0])
+        matches = self.screenshot_manager.find_similar(screenshot_id, self.config.similar_max_distance)
+        if not matches:
+            messagebox.showinfo("Find Similar", f"No captures look like #{screenshot_id}.")
+            return
+        
+        popup = tk.Toplevel(self.root)
+        popup.title(f"Similar to #{screenshot_id}")
+        popup.geometry("700x300")
+        columns = ("ID", "Distance", "Created At", "Extracted Text")
+        tree = ttk.Treeview(popup, columns=columns, show="headings")
+        for column, width in zip(columns, (50, 70, 150, 400)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width, anchor="w" if column == "Extracted Text" else "center")
+        for row, distance in matches:
+            values = self.history_row_values(row)
+            tree.insert("", "end", iid=str(row.id), values=(row.id, distance, values[1], values[3]))
+        tree.pack(fill="both", expand=True)
+        
+        def open_match(event):
+            selected = tree.selection()
+            if not selected:
+                return
+            screenshot = self.screenshot_manager.get_screenshot(int(selected[0]))
+            if screenshot is not None:
+                viewer = self.new_viewer()
+                viewer.show(screenshot.stored_at, screenshot.text or "")
+        tree.bind("<Double-1>", open_match)
+
+    def toggle_watch_region(self):
+        """Pick a region to watch, or stop watching the current one."""
+        if self.screenshot_manager is None:
+            return
+        if self.region_watcher is not None:
+            self.screenshot_manager.stop_watching(self.region_watcher)
+            self.region_watcher = None
+            self.watch_btn.config(text="👁 Watch Region")
+            return
+        # Always select on a frozen frame: its size gives the scale to map the
+        # selection to the grab pixels the watcher polls, on scaled displays too
+        overlay = ScreenshotOverlay(self.root, self.start_watching, freeze_frame=True)
+        overlay.show()
+
+    def start_watching(self, bbox, image=None):
+        """Overlay callback: watch the selected region (bbox in grab pixels)."""
+        self.region_watcher = self.screenshot_manager.watch_region(
+            bbox,
+            interval=self.config.watch_interval,
+            change_threshold=self.config.watch_change_threshold,
+            on_error=self.on_watch_error
+        )
+        self.watch_btn.config(text="■ Stop Watching")
+
+    def on_watch_error(self, watcher, error):
+        """The region watcher gave up after repeated failures."""
+        self.screenshot_manager.stop_watching(watcher)
+        if self.region_watcher is not watcher:
+            return
+        self.region_watcher = None
+        self.watch_btn.config(text="👁 Watch Region")
+        messagebox.showerror("Watch Region", f"Stopped watching the region: {error}")
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar callback that also fetches more rows near either end of the loaded window."""
+        self.history_scrollbar.set(first, last)
+        if self.search_query or self.history_fetch_scheduled:
+            return
+        if float(last) >= 1 - self.SCROLL_MARGIN and not self.window_at_oldest:
+            self.history_fetch_scheduled = True
+            self.root.after_idle(self.load_older_rows)
+        elif float(first) <= self.SCROLL_MARGIN and not self.window_at_newest:
+            self.history_fetch_scheduled = True
+            self.root.after_idle(self.load_newer_rows)
+
+    def loaded_history_ids(self):
+        """Ids of the database rows currently in the Treeview, newest first."""
+        return [int(item) for item in self.tree.get_children()]
+
+    def first_visible_item(self):
+        """The row currently at the top of the view."""
+        children = self.tree.get_children()
+        if not children:
+            return None
+        index = min(int(float(self.tree.yview()[0]) * len(children)), len(children) - 1)
+        return children[index]
+
+    def scroll_to_item(self, item):
+        """Put item back at the top of the view after rows were added or dropped above it."""
+        children = self.tree.get_children()
+        if item is not None and item in children:
+            self.tree.yview_moveto(children.index(item) / len(children))
+
+    def load_older_rows(self):
+        """Append the next window of older rows, dropping rows from the top if needed."""
+        self.history_fetch_scheduled = False
+        loaded = self.loaded_history_ids()
+        if not loaded:
+            return
+        rows = self.screenshot_manager.get_history_window(before_id=loaded[-1], limit=self.FETCH_SIZE)
+        self.window_at_oldest = len(rows) < self.FETCH_SIZE
+        if not rows:
+            return
+        anchor = self.first_visible_item()
+        for row in rows:
+            self.insert_history_row(row)
+        
+        children = self.tree.get_children()
+        excess = len(children) - self.MAX_LOADED_ROWS
+        if excess > 0:
+            self.tree.delete(*children[:excess])
+            self.window_at_newest = False
+        self.scroll_to_item(anchor)
+
+    def load_newer_rows(self):
+        """Prepend the next window of newer rows, dropping rows from the bottom if needed."""
+        self.history_fetch_scheduled = False
+        loaded = self.loaded_history_ids()
+        if not loaded:
+            return
+        rows = self.screenshot_manager.get_history_window(after_id=loaded[0], limit=self.FETCH_SIZE)
+        anchor = self.first_visible_item()
+        for row in reversed(rows):
+            self.insert_history_row(row, 0)
+        if len(rows) < self.FETCH_SIZE:
+            self.window_at_newest = True
+        
+        children = self.tree.get_children()
+        excess = len(children) - self.MAX_LOADED_ROWS
+        if excess > 0:
+            self.tree.delete(*children[-excess:])
+            self.window_at_oldest = False
+        self.scroll_to_item(anchor)
+
+    def on_history_changed(self, events):
+        """Subscriber callback: queue the events and apply them on the next frame."""
+        self.queued_history_events.extend(events)
+        if not self.history_update_scheduled:
+            self.history_update_scheduled = True
+            self.root.after(self.UI_FRAME_MS, self.apply_history_events)
+
+    def apply_history_events(self):
+        """Apply the queued history changes to the loaded rows, without a full reload."""
+        from screenshot_manager import HistoryEvent, coalesce_history_events
+        self.history_update_scheduled = False
+        events = coalesce_history_events(self.queued_history_events)
+        self.queued_history_events = []
+        if not events:
+            return
+        
+        with timings.stage("refresh"):
+            show_new_rows = self.window_at_newest and not self.search_query
+            fetch_ids = []
+            for event in events:
+                item = str(event.screenshot_id)
+                if event.kind == HistoryEvent.DELETED:
+                    if self.tree.exists(item):
+                        self.tree.delete(item)
+                elif self.tree.exists(item) or (event.kind == HistoryEvent.INSERTED and show_new_rows):
+                    # New rows outside the loaded window are picked up when scrolling there
+                    fetch_ids.append(event.screenshot_id)
+            
+            for row in self.screenshot_manager.get_history_rows(fetch_ids):
+                if self.tree.exists(str(row.id)):
+                    self.tree.item(str(row.id), values=self.history_row_values(row),
+                                   tags=self.history_row_tags(row))
+                else:
+                    self.insert_history_row(row, self.history_insert_index(row.id))
+            
+            if self.search_query:
+                self.update_history_label(matches=len(self.tree.get_children()))
+            else:
+                children = self.tree.get_children()
+                excess = len(children) - self.MAX_LOADED_ROWS
+                if excess > 0:
+                    self.tree.delete(*children[-excess:])
+                    self.window_at_oldest = False
+                self.update_history_label()
+
+    def history_insert_index(self, screenshot_id):
+        """Position that keeps the history rows sorted newest first."""
+        for index, item in enumerate(self.tree.get_children()):
+            if int(item) < screenshot_id:
+                return index
+        return "end"
+
+    def update_history_label(self, matches=None):
+        """Show the match count in search mode, otherwise the total number of captures."""
+        if matches is not None:
+            self.history_label.config(text=f"{matches} match(es)")
+        else:
+            total_records = self.screenshot_manager.get_total_screenshots()
+            self.history_label.config(text=f"{total_records} capture(s)")
     
     def refresh_table(self):
-        """Refresh the table data."""
+        """Reload the newest rows of the history, or re-run the active search."""
+        if self.screenshot_manager is None:
+            return  # Still starting up
+        with timings.stage("refresh"):
+            self._refresh_table()
+
+    def _refresh_table(self, history_rows=None):
         # Save selected item if any
         selected_items = self.tree.selection()
-        selected_id = None
-        if selected_items:
-            selected_id = self.tree.item(selected_items[0])['values'][0]
         
         # Clear existing items
         self.tree.delete(*self.tree.get_children())
         
-        # Load new items
-        screenshots = self.screenshot_manager.get_screenshots(self.current_page, self.per_page)
-        
-        # Insert new items
-        for ss in screenshots:
-            created_at_str = ss.created_at.strftime("%Y-%m-%d %H:%M:%S") if ss.created_at else ""
-            item_id = self.tree.insert("", "end", values=(ss.id, created_at_str, ss.stored_at, ss.text))
-            
-            # Reselect previously selected item if it exists
-            if selected_id and ss.id == selected_id:
-                self.tree.selection_set(item_id)
-                self.tree.see(item_id)
-        
-        # Update pagination controls
-        total_records = self.screenshot_manager.get_total_screenshots()
-        total_pages = math.ceil(total_records / self.per_page)
-        self.page_label.config(text=f"Page {self.current_page + 1} of {total_pages}")
+        if self.search_query:
+            # Search results are ranked by relevance and not scrolled in windows
+            rows = self.screenshot_manager.search_screenshots(self.search_query, self.SEARCH_LIMIT)
+            for row in rows:
+                self.insert_history_row(row)
+            self.update_history_label(matches=len(rows))
+        else:
+            rows = history_rows
+            if rows is None:
+                rows = self.screenshot_manager.get_history_window(limit=self.FETCH_SIZE)
+            for row in rows:
+                self.insert_history_row(row)
+            self.window_at_newest = True
+            self.window_at_oldest = len(rows) < self.FETCH_SIZE
+            self.update_history_label()
+        
+        # Reselect previously selected item if it exists
+        selected_items = [item for item in selected_items if self.tree.exists(item)]
+        if selected_items:
+            self.tree.selection_set(selected_items[0])
+            self.tree.see(selected_items[0])
+        else:
+            self.tree.yview_moveto(0)
+
+    def setup_search(self):
+        """Setup the full-text search box."""
+        search_frame = ttk.Frame(self.history_frame)
+        search_frame.pack(fill="x", padx=5, pady=(5, 0))
+        
+        ttk.Label(search_frame, text="Search text:").pack(side="left", padx=5)
+        self.search_var = tk.StringVar()
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var, width=40)
+        search_entry.pack(side="left", padx=5)
+        search_entry.bind("<Return>", lambda e: self.run_search())
+        
+        ttk.Button(
+            search_frame,
+            text="Search",
+            command=self.run_search,
+            width=10
+        ).pack(side="left", padx=5)
         
-        # Update button states
-        self.prev_button.config(state="disabled" if self.current_page <= 0 else "normal")
-        self.next_button.config(state="disabled" if self.current_page >= total_pages - 1 else "normal")
+        ttk.Button(
+            search_frame,
+            text="Clear",
+            command=self.clear_search,
+            width=10
+        ).pack(side="left", padx=5)
+
+    def run_search(self):
+        """Show the best full-text matches for the search box contents."""
+        self.search_query = self.search_var.get().strip()
+        self.refresh_table()
+
+    def clear_search(self):
+        """Leave search mode and go back to the scrolling history."""
+        self.search_var.set("")
+        self.search_query = ""
+        self.refresh_table()
 
     def sort_column(self, column, reverse):
         """Sort table by a column."""
@@ -399,11 +837,11 @@ class MainWindow:
         # Reverse sort next time
         self.tree.heading(column, command=lambda: self.sort_column(column, not reverse))
 
-    def on_page_size_change(self, event):
-        """Handle page size change."""
-        self.per_page = int(self.page_size_var.get())
-        self.current_page = 0  # Reset to first page
-        self.refresh_table()
-
     def start(self):
-        self.root.mainloop()
\ No newline at end of file
+        try:
+            self.root.mainloop()
+        finally:
+            if self.screenshot_manager is not None:
+                self.screenshot_manager.shutdown()
+            if self.math_renderer is not None:
+                self.math_renderer.shutdown()
\ No newline at end of file
@@ -1,9 +1,19 @@
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk
+from math_render import split_math
 
 class OCRViewer:
-    def __init__(self, parent):
+    RENDER_POLL_MS = 50  # How often background formula renders are checked for completion
+
+    def __init__(self, parent, thumbnail_cache=None, math_renderer=None):
+        """With a MathRenderer (and matplotlib installed), the formulas in the
+        text are also shown rendered below it."""
+        self.thumbnail_cache = thumbnail_cache
+        self.math_renderer = math_renderer if math_renderer is not None and math_renderer.available else None
+        self.pending_renders = []  # (tag, latex, display, future) still being rendered
+        # Text.image_create keeps no reference, and the renderer's LRU may drop its own
+        self.math_photos = []
+        self.render_poll_scheduled = False
         self.popup = tk.Toplevel(parent)
         self.popup.title("OCR Result Viewer")
         self.popup.geometry("800x600")
@@ -21,30 +31,138 @@ class OCRViewer:
         self.image_label = ttk.Label(self.image_frame)
         self.image_label.pack(expand=True, fill="both")
         
-        # Right side - Text
-        self.text_frame = ttk.Frame(self.paned)
+        # Right side - Text, with the rendered math below it
+        self.text_paned = ttk.PanedWindow(self.paned, orient=tk.VERTICAL)
+        self.text_frame = ttk.Frame(self.text_paned)
         self.text_area = tk.Text(self.text_frame, wrap=tk.WORD)
         self.text_area.pack(expand=True, fill="both")
+        self.text_paned.add(self.text_frame, weight=1)
+        
+        if self.math_renderer is not None:
+            self.rendered_frame = ttk.LabelFrame(self.text_paned, text="Rendered")
+            self.rendered_area = tk.Text(self.rendered_frame, wrap=tk.WORD, cursor="arrow", state=tk.DISABLED)
+            self.rendered_area.tag_configure("render_error", foreground="red")
+            self.rendered_area.pack(expand=True, fill="both")
+            self.text_paned.add(self.rendered_frame, weight=1)
         
         # Add frames to paned window
         self.paned.add(self.image_frame)
-        self.paned.add(self.text_frame)
+        self.paned.add(self.text_paned)
         
     def show(self, image_path, ocr_text):
         """Display the image and OCR text."""
-        # Load and display image
-        image = Image.open(image_path)
-        # Resize image to fit the window while maintaining aspect ratio
-        display_size = (400, 400)
-        image.thumbnail(display_size, Image.Resampling.LANCZOS)
-        photo = ImageTk.PhotoImage(image)
-        self.image_label.configure(image=photo)
-        self.image_label.image = photo  # Keep a reference
+        self.show_image(image_path)
         
         # Display OCR text
         self.text_area.delete('1.0', tk.END)
         self.text_area.insert('1.0', ocr_text)
+        self.show_rendered(ocr_text)
         
+        self.center()
+
+    def show_streaming(self, image_path):
+        """Open right away with the image; the text arrives through `append_text`."""
+        self.popup.title("OCR Result Viewer (extracting…)")
+        self.show_image(image_path)
+        self.text_area.delete('1.0', tk.END)
+        self.center()
+
+    def append_text(self, chunk):
+        """Append a streamed chunk of OCR output."""
+        if not self.popup.winfo_exists():
+            return  # Closed before OCR finished
+        self.text_area.insert(tk.END, chunk)
+        self.text_area.see(tk.END)
+
+    def finish_streaming(self, screenshot_ids, error):
+        """Mark the streamed text as complete, or show why OCR failed."""
+        if not self.popup.winfo_exists():
+            return
+        if error is not None:
+            self.popup.title("OCR Result Viewer (failed)")
+            self.text_area.insert(tk.END, f"\n\n⚠ OCR failed: {error}")
+        else:
+            self.popup.title("OCR Result Viewer")
+            self.show_rendered(self.text_area.get('1.0', 'end-1c'))
+
+    def show_rendered(self, text):
+        """Fill the rendered pane with text, formulas drawn as images.
+
+        Formulas rendered before appear right away; the others show as
+        source until their background render finishes (or in red if
+        mathtext can't draw them).
+        """
+        if self.math_renderer is None:
+            return
+        area = self.rendered_area
+        area.config(state=tk.NORMAL)
+        area.delete('1.0', tk.END)
+        self.pending_renders = []
+        self.math_photos = []
+        for number, (kind, content) in enumerate(split_math(text)):
+            if kind == "text":
+                area.insert(tk.END, content)
+                continue
+            display = kind == "display"
+            photo = self.math_renderer.cached_photo(content, display)
+            if photo is not None:
+                area.image_create(tk.END, image=photo)
+                self.math_photos.append(photo)
+            else:
+                tag = f"math{number}"
+                area.insert(tk.END, content, (tag,))
+                self.pending_renders.append((tag, content, display, self.math_renderer.render_async(content, display)))
+        area.config(state=tk.DISABLED)
+        if self.pending_renders and not self.render_poll_scheduled:
+            self.render_poll_scheduled = True
+            self.popup.after(self.RENDER_POLL_MS, self.poll_renders)
+
+    def poll_renders(self):
+        """Swap finished renders into the rendered pane."""
+        self.render_poll_scheduled = False
+        if not self.popup.winfo_exists():
+            return
+        area = self.rendered_area
+        area.config(state=tk.NORMAL)
+        waiting = []
+        for tag, latex, display, future in self.pending_renders:
+            if not future.done():
+                waiting.append((tag, latex, display, future))
+                continue
+            ranges = area.tag_ranges(tag)
+            if not ranges:
+                continue
+            try:
+                path = future.result()
+            except Exception:
+                area.tag_add("render_error", *ranges)  # Left as source
+                continue
+            area.delete(*ranges)
+            photo = self.math_renderer.photo_for(latex, display, path)
+            area.image_create(ranges[0], image=photo)
+            self.math_photos.append(photo)
+        area.config(state=tk.DISABLED)
+        self.pending_renders = waiting
+        if waiting:
+            self.render_poll_scheduled = True
+            self.popup.after(self.RENDER_POLL_MS, self.poll_renders)
+
+    def show_image(self, image_path):
+        # Load and display image
+        if self.thumbnail_cache is not None:
+            # Cached (and usually pre-generated) thumbnail
+            photo = self.thumbnail_cache.get_photo(image_path)
+        else:
+            from PIL import Image, ImageTk
+            image = Image.open(image_path)
+            # Resize image to fit the window while maintaining aspect ratio
+            display_size = (400, 400)
+            image.thumbnail(display_size, Image.Resampling.LANCZOS)
+            photo = ImageTk.PhotoImage(image)
+        self.image_label.configure(image=photo)
+        self.image_label.image = photo  # Keep a reference
+
+    def center(self):
         # Center the window on screen
         self.popup.update_idletasks()
         width = self.popup.winfo_width()
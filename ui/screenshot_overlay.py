@@ -1,33 +1,83 @@
-import time
 import tkinter as tk
+from instrumentation import timings
 
 class ScreenshotOverlay:
-    def __init__(self, parent, callback):
+    HIDE_DELAY_MS = 200  # Time for the overlay to disappear before a live grab
+    SETTLE_MS = 150  # Time for the main window to disappear before a freeze-frame grab
+    SHIFT_MASK = 0x0001  # Shift bit of a Tk event's state
+
+    def __init__(self, parent, callback, freeze_frame=False, on_regions=None):
+        """Let the user drag a rectangle and call callback(bbox, image).
+
+        With freeze_frame, the screen is grabbed once before the overlay is
+        shown and used as its background; `image` is then the selected crop
+        of that grab and bbox is in the grab's (physical) pixels, which
+        differ from Tk's on scaled displays. Otherwise `image` is None and
+        the caller grabs bbox.
+
+        With on_regions, Shift+drag selects several rectangles (Enter or a
+        plain drag finishes, Escape cancels) and on_regions is called with
+        a list of (bbox, image) pairs when more than one was selected.
+        """
         self.parent = parent
         self.callback = callback
+        self.on_regions = on_regions
+        self.freeze_frame = freeze_frame
+        self.frozen = None
+        self.regions = []
         self.start_x = None
         self.start_y = None
         self.rect = None
-        
+
     def show(self):
         """Display the screenshot selection overlay."""
+        if not self.freeze_frame:
+            self.parent.withdraw()
+            self._show_overlay()
+            return
+        # Don't freeze our own window into the frame
+        was_visible = self.parent.winfo_viewable()
+        self.parent.withdraw()
+        if was_visible:
+            self.parent.after(self.SETTLE_MS, self._grab_and_show)
+        else:
+            self._grab_and_show()
+
+    def _grab_and_show(self):
+        from PIL import ImageGrab
+        with timings.stage("grab"):
+            self.frozen = ImageGrab.grab()
+        self._show_overlay()
+
+    def _show_overlay(self):
         self.overlay = tk.Toplevel(self.parent)
         self.overlay.overrideredirect(True)
         screen_width = self.overlay.winfo_screenwidth()
         screen_height = self.overlay.winfo_screenheight()
         self.overlay.geometry(f"{screen_width}x{screen_height}+0+0")
         self.overlay.attributes("-topmost", True)
-        self.overlay.attributes("-alpha", 0.3)
         self.overlay.config(bg="black")
-        
-        self.canvas = tk.Canvas(self.overlay, cursor="cross", bg="black")
+
+        self.canvas = tk.Canvas(self.overlay, cursor="cross", bg="black", highlightthickness=0)
         self.canvas.pack(fill=tk.BOTH, expand=True)
-        
+
+        if self.frozen is not None:
+            from PIL import ImageTk
+            # The grab is in physical pixels, which differ from Tk's on scaled displays
+            background = self.frozen
+            if background.size != (screen_width, screen_height):
+                background = background.resize((screen_width, screen_height))
+            self.background = ImageTk.PhotoImage(background)  # Keep a reference
+            self.canvas.create_image(0, 0, image=self.background, anchor="nw")
+        else:
+            self.overlay.attributes("-alpha", 0.3)
+
         self.canvas.bind("<ButtonPress-1>", self.on_button_press)
         self.canvas.bind("<B1-Motion>", self.on_mouse_drag)
         self.canvas.bind("<ButtonRelease-1>", self.on_button_release)
-        
-        self.parent.withdraw()
+        self.overlay.bind("<Return>", self.finish)
+        self.overlay.bind("<Escape>", self.cancel)
+        self.overlay.focus_force()
 
     def on_button_press(self, event):
         self.start_x, self.start_y = event.x, event.y
@@ -47,7 +97,50 @@ class ScreenshotOverlay:
             max(self.start_x, event.x),
             max(self.start_y, event.y)
         )
+        if bbox[2] - bbox[0] >= 2 and bbox[3] - bbox[1] >= 2:
+            self.regions.append(bbox)
+        elif self.rect:
+            self.canvas.delete(self.rect)  # A click rather than a selection
+        self.rect = None
+        # Holding Shift keeps the overlay open for more regions
+        if self.on_regions is not None and event.state & self.SHIFT_MASK:
+            return
+        self.finish()
+
+    def finish(self, event=None):
+        """Close the overlay and hand over the selected regions."""
+        screen_size = (self.overlay.winfo_screenwidth(), self.overlay.winfo_screenheight())
         self.overlay.destroy()
-        time.sleep(0.2)  # Ensure overlay is gone
         self.parent.deiconify()
-        self.callback(bbox)
\ No newline at end of file
+        if not self.regions:
+            return
+
+        if self.frozen is None:
+            # Give the overlay time to disappear without blocking the Tk loop
+            regions = [(bbox, None) for bbox in self.regions]
+            delay = self.HIDE_DELAY_MS
+        else:
+            boxes = [self._to_grab_pixels(bbox, screen_size) for bbox in self.regions]
+            regions = [(bbox, self.frozen.crop(bbox)) for bbox in boxes]
+            self.frozen = None
+            delay = 0
+        if len(regions) == 1:
+            self.parent.after(delay, self.callback, *regions[0])
+        else:
+            self.parent.after(delay, self.on_regions, regions)
+
+    def cancel(self, event=None):
+        self.regions = []
+        self.frozen = None
+        self.finish()
+
+    def _to_grab_pixels(self, bbox, screen_size):
+        """Map bbox from Tk screen coordinates to pixels of the frozen grab."""
+        scale_x = self.frozen.width / screen_size[0]
+        scale_y = self.frozen.height / screen_size[1]
+        return (
+            round(bbox[0] * scale_x),
+            round(bbox[1] * scale_y),
+            round(bbox[2] * scale_x),
+            round(bbox[3] * scale_y)
+        )
@@ -0,0 +1,57 @@
+import itertools
+import queue
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WorkerPool:
+    """Bounded thread pool whose results are handed back on the caller's thread.
+
+    Jobs run on background threads, but their completion callbacks are only
+    invoked from `poll()`, which the UI schedules with `root.after` so that
+    all Tk and database work stays on the main thread.
+    """
+
+    def __init__(self, max_workers=2, max_pending=8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-worker")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._completed = queue.Queue()
+        self._ids = itertools.count(1)
+
+    def submit(self, fn, *args, on_done=None):
+        """Schedule fn(*args) and return a job id immediately."""
+        if not self._slots.acquire(blocking=False):
+            raise RuntimeError("Too many OCR jobs in flight, please wait for some to finish.")
+        job_id = next(self._ids)
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._completed.put((self._finish, (job_id, f, on_done))))
+        return job_id
+
+    def post(self, callback, *args):
+        """Run callback(*args) on the next `poll()`; safe to call from worker threads."""
+        self._completed.put((callback, args))
+
+    def _finish(self, job_id, future, on_done):
+        self._slots.release()
+        if on_done is not None:
+            on_done(job_id, future)
+
+    def poll(self):
+        """Run the callbacks of finished jobs and posted calls. Must be called from the UI thread.
+
+        A callback that raises is reported on stderr, like Tk does, and the
+        remaining callbacks still run.
+        """
+        while True:
+            try:
+                callback, args = self._completed.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                callback(*args)
+            except Exception:
+                traceback.print_exc()
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)